@@ -0,0 +1,95 @@
+"""
+Secondary indexes for searching and paging through accounts.
+
+AccountStore finds an account by its number in O(1). These indexes support
+the admin view, which needs accounts in order and by prefix: the account
+number, the name (case-insensitive) and the email (case-insensitive). Each
+index is a sorted list of (key, account number) pairs searched with bisect,
+so counting the accounts matching a prefix is O(log n) and fetching one page
+is O(log n + page size), however many accounts there are.
+
+An AccountStore builds its AccountIndex on first use and keeps it up to date
+as accounts are added and removed (see AccountStore.search_index()).
+"""
+
+from bisect import bisect_left, insort
+
+# the end of every prefix range: no key continues with a larger character
+_MAX_CHAR = "\U0010ffff"
+
+FIELDS = ("accountNo", "name", "email")
+
+
+class PrefixIndex:
+    """Sorted (key, account number) pairs with prefix range lookups."""
+
+    def __init__(self, pairs=()):
+        self.pairs = sorted(pairs)
+
+    def add(self, key, account_no):
+        insort(self.pairs, (key, account_no))
+
+    def remove(self, key, account_no):
+        i = bisect_left(self.pairs, (key, account_no))
+        if i < len(self.pairs) and self.pairs[i] == (key, account_no):
+            del self.pairs[i]
+
+    def _range(self, prefix):
+        # (prefix,) sorts before every (key, account_no) with key >= prefix
+        return (bisect_left(self.pairs, (prefix,)),
+                bisect_left(self.pairs, (prefix + _MAX_CHAR,)))
+
+    def count(self, prefix=""):
+        lo, hi = self._range(prefix)
+        return hi - lo
+
+    def page(self, prefix="", offset=0, size=25):
+        """Account numbers of matches offset .. offset + size, in key order."""
+        lo, hi = self._range(prefix)
+        start = min(lo + offset, hi)
+        return [account_no for _, account_no in self.pairs[start:min(start + size, hi)]]
+
+
+class AccountIndex:
+    def __init__(self, records=(), key="accountNo"):
+        self.key = key
+        # account number -> the keys it is indexed under, so it can be taken
+        # out again even if the record was changed in place since
+        self.indexed = {}
+        pairs = {field: [] for field in FIELDS}
+        for record in records:
+            account_no = record[key]
+            keys = self._keys(record)
+            self.indexed[account_no] = keys
+            for field, k in zip(FIELDS, keys):
+                pairs[field].append((k, account_no))
+        self.fields = {field: PrefixIndex(pairs[field]) for field in FIELDS}
+
+    def _keys(self, record):
+        return (record[self.key], str(record.get("name", "")).lower(), str(record.get("email", "")).lower())
+
+    def _normalize(self, field, prefix):
+        return prefix if field == "accountNo" else prefix.lower()
+
+    def add(self, record):
+        account_no = record[self.key]
+        self.remove(account_no)
+        keys = self._keys(record)
+        self.indexed[account_no] = keys
+        for field, k in zip(FIELDS, keys):
+            self.fields[field].add(k, account_no)
+
+    def remove(self, account_no):
+        keys = self.indexed.pop(account_no, None)
+        if keys is not None:
+            for field, k in zip(FIELDS, keys):
+                self.fields[field].remove(k, account_no)
+
+    def count(self, field, prefix=""):
+        return self.fields[field].count(self._normalize(field, prefix))
+
+    def page(self, field, prefix="", offset=0, size=25):
+        return self.fields[field].page(self._normalize(field, prefix), offset, size)
+
+    def __len__(self):
+        return len(self.indexed)
@@ -0,0 +1,91 @@
+"""
+In-memory account store shared by both bank front-ends.
+
+Accounts stay plain dicts (the JSON schema does not change) but they are kept
+in a dict keyed by account number, so looking up or authenticating an account
+is a single hash lookup instead of a scan over every account. The dict keeps
+insertion order, so iterating or saving gives the same order as the file.
+
+The key field differs between the apps: "accountNo" in the Streamlit app and
+"accountNo." in the CLI Bank class.
+
+With compact=True records are held as records.Account objects (slots and
+array-backed transaction history) instead of dicts; they still support the
+dict operations the apps use, and to_list() converts them back to dicts.
+
+search_index() adds sorted name/email/number indexes for searching and
+paging (see account_index.py); they are only built when first asked for.
+cached_load() keeps a backend's store, indexes included, until its data
+changes.
+"""
+
+import threading
+
+from account_index import AccountIndex
+from records import Account
+
+
+class AccountStore:
+    def __init__(self, records=(), key="accountNo", compact=False):
+        self.key = key
+        self.compact = compact
+        self.index = {}
+        self.secondary = None
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index.values())
+
+    def __contains__(self, account_no):
+        return account_no in self.index
+
+    def get(self, account_no):
+        return self.index.get(account_no)
+
+    def add(self, record):
+        if self.compact and not isinstance(record, Account):
+            record = Account.from_dict(record)
+        self.index[record[self.key]] = record
+        if self.secondary is not None:
+            self.secondary.add(record)
+
+    def remove(self, account_no):
+        if self.secondary is not None:
+            self.secondary.remove(account_no)
+        return self.index.pop(account_no, None)
+
+    def search_index(self):
+        if self.secondary is None:
+            self.secondary = AccountIndex(self.index.values(), key=self.key)
+        return self.secondary
+
+    def to_list(self):
+        if self.compact:
+            return [record.to_dict() for record in self.index.values()]
+        return list(self.index.values())
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def cached_load(backend):
+    """
+    backend.load(), loaded again only if the backend's data_stamp() changed.
+    The sharded and SQLite backends build a new store (and so a new search
+    index) on every load(); this keeps one across Streamlit reruns.
+    """
+    stamp = backend.data_stamp()
+    with _loaded_lock:
+        cached = _loaded.get(id(backend))
+    if stamp is not None and cached is not None and cached[0] == stamp:
+        return cached[1]
+    store = backend.load()
+    if stamp is not None:
+        with _loaded_lock:
+            _loaded[id(backend)] = (stamp, store)
+    return store
@@ -0,0 +1,185 @@
+"""
+Bank-wide analytics: daily totals, the balance distribution and the most
+active accounts.
+
+Every account and transaction is read in a single pass over
+backend.iter_accounts() into flat arrays (one entry per transaction: which
+account, which day, how much, money in or out), which are then turned
+into NumPy arrays. The figures are computed on those arrays with bincount,
+unique and histogram instead of Python loops over dicts.
+
+Loading is the expensive part, so the loaded snapshot is cached per backend
+and reused until backend.data_stamp() says the data has changed. Backends
+that cannot tell (data_stamp() is None) are read again every time.
+
+NumPy is optional for the rest of the bank; only this module needs it
+(pip install numpy).
+
+How to run:
+    python analytics.py
+    python analytics.py --data data.json --backend sqlite --top 20
+"""
+
+import argparse
+import threading
+from array import array
+
+from banking import TX_SIGNS
+from records import _INT_AMOUNT, type_code
+from storage import open_backend
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY_MICROS = 86_400_000_000
+# type codes of the transactions taking money out (withdrawals, fees)
+OUTGOING = {type_code(ttype) for ttype, sign in TX_SIGNS.items() if sign < 0}
+
+# id(backend) -> (data stamp, Snapshot)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("Bank analytics need NumPy (pip install numpy).")
+
+
+class Snapshot:
+    """All accounts and transactions as NumPy arrays."""
+
+    def __init__(self, backend):
+        require_numpy()
+        key = backend.key
+        self.accounts = []
+        self.names = []
+        balances = array("d")
+        # one entry per transaction
+        owners = array("q")
+        amounts = array("d")
+        withdrawals = array("b")
+        # day numbers of compact histories, ISO dates of dict histories
+        days = array("q")
+        dates = []
+        dated = array("q")
+        for i, acct in enumerate(backend.iter_accounts()):
+            self.accounts.append(acct[key])
+            self.names.append(acct.get("name", ""))
+            balances.append(acct.get("balance", 0))
+            txs = acct.get("transactions", [])
+            if not txs:
+                continue
+            if hasattr(txs, "times"):
+                # a TransactionLog: copy its arrays instead of building dicts
+                owners.extend([i] * len(txs))
+                amounts.extend(txs.amounts)
+                withdrawals.extend([(code & ~_INT_AMOUNT) in OUTGOING for code in txs.codes])
+                days.extend(t // DAY_MICROS for t in txs.times)
+                continue
+            for tx in txs:
+                dated.append(len(owners))
+                owners.append(i)
+                amounts.append(tx["amount"])
+                withdrawals.append(TX_SIGNS.get(tx["type"], 1) < 0)
+                days.append(0)
+                dates.append(tx["timestamp"][:10])
+
+        self.balances = np.frombuffer(balances, dtype=np.float64)
+        self.owners = np.frombuffer(owners, dtype=np.int64)
+        self.amounts = np.frombuffer(amounts, dtype=np.float64)
+        self.withdrawals = np.frombuffer(withdrawals, dtype=np.int8).astype(bool)
+        self.days = np.frombuffer(days, dtype=np.int64).copy()
+        if dates:
+            # numpy parses the ISO dates in one go
+            self.days[np.frombuffer(dated, dtype=np.int64)] = (
+                np.array(dates, dtype="datetime64[D]").astype(np.int64))
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def daily_totals(self):
+        """Per day with transactions: date, deposits, withdrawals, net and count."""
+        days, inverse = np.unique(self.days, return_inverse=True)
+        deposited = np.where(self.withdrawals, 0.0, self.amounts)
+        withdrawn = np.where(self.withdrawals, self.amounts, 0.0)
+        deposits = np.bincount(inverse, weights=deposited, minlength=len(days))
+        withdrawals = np.bincount(inverse, weights=withdrawn, minlength=len(days))
+        return {"date": days.astype("datetime64[D]"), "deposits": deposits,
+                "withdrawals": withdrawals, "net": deposits - withdrawals,
+                "count": np.bincount(inverse, minlength=len(days))}
+
+    def balance_distribution(self, bins=20):
+        """Histogram of account balances plus a few percentiles."""
+        if not len(self):
+            return {"counts": np.zeros(0, dtype=np.int64), "edges": np.zeros(0), "percentiles": {}}
+        counts, edges = np.histogram(self.balances, bins=bins)
+        points = (10, 25, 50, 75, 90, 99)
+        return {"counts": counts, "edges": edges,
+                "percentiles": dict(zip(points, np.percentile(self.balances, points)))}
+
+    def most_active(self, n=10):
+        """The ``n`` accounts with the most transactions, busiest first."""
+        counts = np.bincount(self.owners, minlength=len(self))
+        volume = np.bincount(self.owners, weights=self.amounts, minlength=len(self))
+        n = min(n, len(self))
+        if n == 0:
+            return []
+        top = np.argpartition(counts, -n)[-n:]
+        top = top[np.argsort(counts[top], kind="stable")[::-1]]
+        return [{"accountNo": self.accounts[i], "name": self.names[i],
+                 "transactions": int(counts[i]), "volume": float(volume[i]),
+                 "balance": float(self.balances[i])} for i in top]
+
+    def summary(self):
+        return {"accounts": len(self), "transactions": len(self.amounts),
+                "total balance": float(self.balances.sum()),
+                "deposited": float(self.amounts[~self.withdrawals].sum()),
+                "withdrawn": float(self.amounts[self.withdrawals].sum())}
+
+
+def snapshot(backend):
+    """The backend's Snapshot, loaded again only if its data changed."""
+    stamp = backend.data_stamp()
+    with _snapshots_lock:
+        cached = _snapshots.get(id(backend))
+    if stamp is not None and cached is not None and cached[0] == stamp:
+        return cached[1]
+    snap = Snapshot(backend)
+    if stamp is not None:
+        with _snapshots_lock:
+            _snapshots[id(backend)] = (stamp, snap)
+    return snap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print bank-wide totals, balances and the busiest accounts.")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--key", default="accountNo",
+                        help='account number field ("accountNo." for the CLI data)')
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--top", type=int, default=10, help="number of busiest accounts to list")
+    args = parser.parse_args()
+
+    try:
+        snap = snapshot(open_backend(args.data, key=args.key, kind=args.backend))
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    for name, value in snap.summary().items():
+        print(f"{name:>14}: {value:,.2f}" if isinstance(value, float) else f"{name:>14}: {value:,}")
+    daily = snap.daily_totals()
+    print(f"\n{'day':<10} {'deposits':>14} {'withdrawals':>14} {'count':>8}")
+    for i in range(max(0, len(daily["date"]) - 14), len(daily["date"])):
+        print(f"{str(daily['date'][i]):<10} {daily['deposits'][i]:>14,.2f} "
+              f"{daily['withdrawals'][i]:>14,.2f} {daily['count'][i]:>8,}")
+    print("\nbalance percentiles:")
+    for p, value in snap.balance_distribution()["percentiles"].items():
+        print(f"  p{p:<3} {value:,.2f}")
+    print(f"\n{'account':<10} {'transactions':>12} {'volume':>14}")
+    for row in snap.most_active(args.top):
+        print(f"{row['accountNo']:<10} {row['transactions']:>12,} {row['volume']:>14,.2f}")
+
+
+if __name__ == "__main__":
+    main()
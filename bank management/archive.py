@@ -0,0 +1,277 @@
+"""
+Archive old transactions into compressed monthly files.
+
+Every deposit and withdrawal stays in its account's history for good, so the
+data file (or segments, or database) keeps growing and loading it pays for
+years of history. archive() moves the transactions from before a cutoff (the
+start of a month) out of the backend into a .archive directory next to the
+data file:
+
+    2025-01.jsonl.gz    one compressed member per account (gzip or xz),
+                        holding that account's transactions of the month as
+                        JSON lines; members are appended, never rewritten
+    2025-01.idx.json    index: account number -> [offset, length, count,
+                        first, last] of each of its members (first and last
+                        in epoch microseconds)
+
+so reading one account's month decompresses only its own bytes. Each
+archived account keeps a checkpoint in its record:
+
+    "archived": {"until": "2025-02-01T00:00:00Z", "balance": 1234.5,
+                 "count": 310, "months": ["2024-11", "2024-12", "2025-01"]}
+
+the balance at the cutoff, and the months to look in. Everything before
+"until" is archived and everything after it is still in the backend, so
+transactions_between() here (used by statements.py) reads the archive only
+when a range reaches back before "until".
+
+The archive files and indexes are written and fsync'ed before the backend is
+saved with the shortened histories. A run interrupted in between leaves
+members behind that no checkpoint covers yet; readers ignore them and the
+next run drops them from the index. The backend is saved as a whole, so
+stop the apps using the data first: a change made during a run would be
+lost. The archived accounts get a new version, so a session still holding
+one of them gets a conflict and re-reads it.
+
+How to run:
+    python archive.py --older-than 365
+    python archive.py --data bank_data.json --backend segmented --older-than 90 --codec xz
+"""
+
+import argparse
+import gzip
+import json
+import lzma
+import os
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import serializer
+from account_store import AccountStore
+from banking import TX_SIGNS, from_minor, to_minor
+from records import iso_to_micros, time_range
+from storage import open_backend, write_durably
+
+CODECS = {
+    "gzip": (".jsonl.gz", lambda data: gzip.compress(data, mtime=0), gzip.decompress),
+    "xz": (".jsonl.xz", lzma.compress, lzma.decompress),
+}
+OFFSET, LENGTH, COUNT, FIRST, LAST = range(5)
+
+
+def month_of(tx):
+    # "2025-01-31T23:59:59Z" -> "2025-01"
+    return tx["timestamp"][:7]
+
+
+def cutoff_for(today, days):
+    """The start of the month ``days`` days before ``today``."""
+    return (today - timedelta(days=days)).replace(day=1)
+
+
+class Archive:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        # month -> (mtime_ns, index)
+        self.indexes = {}
+
+    def index_path(self, month):
+        return self.directory / f"{month}.idx.json"
+
+    def index(self, month):
+        """The month's index ({"codec": ..., "accounts": {...}}), or None."""
+        path = self.index_path(month)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            cached = self.indexes.get(month)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        index = json.loads(path.read_text(encoding="utf-8"))
+        with self.lock:
+            self.indexes[month] = (mtime, index)
+        return index
+
+    def read(self, month, account_no, until):
+        """Yield the account's archived transactions of ``month``, oldest first."""
+        index = self.index(month)
+        if index is None:
+            return
+        # members starting at or after the checkpoint are left over from an
+        # interrupted run
+        members = [m for m in index["accounts"].get(account_no, []) if m[FIRST] < until]
+        if not members:
+            return
+        suffix, _, decompress = CODECS[index["codec"]]
+        with open(self.directory / (month + suffix), "rb") as fs:
+            for member in members:
+                fs.seek(member[OFFSET])
+                for line in decompress(fs.read(member[LENGTH])).splitlines():
+                    yield serializer.loads(line)
+
+    def between(self, account_no, checkpoint, start, end=None):
+        """Archived transactions with start <= time < end, oldest first."""
+        until = iso_to_micros(checkpoint["until"])
+        for month in sorted(checkpoint["months"]):
+            first = iso_to_micros(month + "-01T00:00:00")
+            if end is not None and first >= end:
+                break
+            if iso_to_micros(_next_month(month) + "-01T00:00:00") <= start:
+                continue
+            for tx in self.read(month, account_no, until):
+                micros = iso_to_micros(tx["timestamp"])
+                if micros >= start and (end is None or micros < end):
+                    yield tx
+
+
+def _next_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+
+def archive_for(backend):
+    """The (shared) Archive of ``backend``'s data file."""
+    directory = backend.path.with_suffix(".archive")
+    with _opened_lock:
+        if directory not in _opened:
+            _opened[directory] = Archive(directory)
+        return _opened[directory]
+
+
+def transactions_between(backend, acct, start, end=None):
+    """
+    Like backend.transactions_between(), including archived transactions:
+    ``acct`` is the account as returned by get_account().
+    """
+    account_no = acct[backend.key]
+    checkpoint = acct.get("archived")
+    if checkpoint is not None:
+        until = iso_to_micros(checkpoint["until"])
+        if start < until:
+            stop = until if end is None else min(end, until)
+            yield from archive_for(backend).between(account_no, checkpoint, start, stop)
+            if end is not None and end <= until:
+                return
+            start = until
+    yield from backend.transactions_between(account_no, start, end)
+
+
+class _MonthWriter:
+    """Appends members to one month's file and keeps its index up to date."""
+
+    def __init__(self, archive, month, codec):
+        self.archive = archive
+        self.month = month
+        index = archive.index(month)
+        # a copy: the cached index stays as on disk until close()
+        self.index = ({"codec": index["codec"], "accounts": dict(index["accounts"])} if index
+                      else {"codec": codec, "accounts": {}})
+        suffix, self.compress, _ = CODECS[self.index["codec"]]
+        self.fs = open(archive.directory / (month + suffix), "ab")
+        self.written = 0
+
+    def add(self, account_no, txs, covered):
+        """Append ``txs``; drop the account's members not ``covered`` by its checkpoint."""
+        data = self.compress(b"".join(serializer.dumps_line(tx) for tx in txs))
+        offset = self.fs.seek(0, os.SEEK_END)
+        self.fs.write(data)
+        self.written += len(data)
+        members = [m for m in self.index["accounts"].get(account_no, []) if covered(m)]
+        members.append([offset, len(data), len(txs), iso_to_micros(txs[0]["timestamp"]),
+                        iso_to_micros(txs[-1]["timestamp"])])
+        self.index["accounts"][account_no] = members
+
+    def close(self):
+        self.fs.flush()
+        os.fsync(self.fs.fileno())
+        self.fs.close()
+        write_durably(self.archive.index_path(self.month), json.dumps(self.index).encode("utf-8"))
+
+
+def archive(backend, cutoff, codec="gzip"):
+    """
+    Move every transaction before ``cutoff`` (a date; the first of a month)
+    into the archive. Returns counts: accounts, transactions, months, bytes.
+    """
+    if cutoff.day != 1:
+        raise ValueError("The cutoff must be the first day of a month.")
+    until_iso = cutoff.isoformat() + "T00:00:00Z"
+    until = iso_to_micros(until_iso)
+    # copies: some backends hand out the records of their cache
+    store = AccountStore((dict(acct.items()) for acct in backend.iter_accounts()), key=backend.key)
+    target = archive_for(backend)
+    target.directory.mkdir(parents=True, exist_ok=True)
+    writers = {}
+    counts = {"accounts": 0, "transactions": 0, "months": 0, "bytes": 0}
+    try:
+        for acct in store:
+            txs = list(acct.get("transactions") or [])
+            split = time_range(txs, until)[0]
+            if not split:
+                continue
+            old, kept = txs[:split], txs[split:]
+            checkpoint = acct.get("archived")
+            before = iso_to_micros(checkpoint["until"]) if checkpoint else None
+
+            def covered(member):
+                return before is not None and member[FIRST] < before
+
+            months = {}
+            for tx in old:
+                months.setdefault(month_of(tx), []).append(tx)
+            for month, group in months.items():
+                if month not in writers:
+                    writers[month] = _MonthWriter(target, month, codec)
+                writers[month].add(acct[backend.key], group, covered)
+
+            later = sum(TX_SIGNS.get(tx["type"], 1) * to_minor(tx["amount"]) for tx in kept)
+            acct["archived"] = {
+                "until": until_iso,
+                "balance": from_minor(to_minor(acct["balance"]) - later),
+                "count": (checkpoint["count"] if checkpoint else 0) + len(old),
+                "months": sorted(set(checkpoint["months"] if checkpoint else []) | set(months)),
+            }
+            acct["transactions"] = kept
+            acct["version"] = acct.get("version", 0) + 1
+            counts["accounts"] += 1
+            counts["transactions"] += len(old)
+    finally:
+        for writer in writers.values():
+            writer.close()
+            counts["bytes"] += writer.written
+    counts["months"] = len(writers)
+    if counts["accounts"]:
+        backend.save(store)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old transactions into compressed monthly archives.")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--older-than", type=int, default=365, metavar="DAYS",
+                        help="archive the months that ended at least this many days ago")
+    parser.add_argument("--codec", default="gzip", choices=list(CODECS),
+                        help="compression for new months (existing months keep theirs)")
+    args = parser.parse_args()
+
+    backend = open_backend(args.data, key="accountNo", kind=args.backend)
+    cutoff = cutoff_for(date.today(), args.older_than)
+    start = time.perf_counter()
+    counts = archive(backend, cutoff, args.codec)
+    print(f"archived {counts['transactions']:,} transactions before {cutoff} from "
+          f"{counts['accounts']:,} accounts into {counts['months']} months "
+          f"({counts['bytes']:,} bytes) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
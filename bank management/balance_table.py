@@ -0,0 +1,204 @@
+"""
+Account balances and versions in a memory-mapped file of fixed-width records.
+
+The file starts with a 32-byte header (magic, slots in use, change counter)
+followed by one 16-byte record per account slot: the balance in whole minor
+units (see banking.to_minor) and the account's version, both signed 64-bit
+little-endian integers. Record ``slot`` is at a fixed offset, so changing a
+balance is a 16-byte write into the mapping (plus two 8-byte updates of the
+change counter), and reading one is a 16-byte read, however many accounts
+there are. Slots are handed out in order; the storage backend keeps each
+account's slot in its profile (see storage.MappedBackend).
+
+Every process using the file maps the same pages, so a write is seen by the
+others at once. Writers hold the backend's commit lock; readers do not, so
+the change counter doubles as a sequence lock: it is odd while a record is
+being written, and a reader that saw it change reads again. When a write
+reaches the disk depends on the sync policy:
+
+    always     msync the written page after every write (the default)
+    interval   msync at most once every ``interval`` seconds, on a write
+    never      leave it to the operating system
+
+A crashed process loses nothing under any policy; "interval" and "never" can
+lose the latest changes if the machine itself goes down.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+MAGIC = b"BALTAB01"
+# padded to 32 bytes so no record straddles two pages
+HEADER = struct.Struct("<8sqq8x")  # magic, slots in use, changes
+RECORD = struct.Struct("<qq")  # balance in minor units, version
+SLOTS_AT = 8
+CHANGES_AT = 16
+# slots added each time the file has to grow
+GROW = 4096
+# reads retried while a write is in progress before giving up waiting (a
+# writer that died half-way leaves the counter odd until the next write)
+READ_TRIES = 1000
+SYNC_POLICIES = ("always", "interval", "never")
+
+
+class BalanceTable:
+    def __init__(self, path, sync="always", interval=1.0):
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"Unknown sync policy {sync!r}, choose from {', '.join(SYNC_POLICIES)}")
+        self.path = Path(path)
+        self.sync = sync
+        self.interval = interval
+        self.synced = time.monotonic()
+        # the mapping is replaced when the file grows; not while in use
+        self.lock = threading.RLock()
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size < HEADER.size:
+            os.ftruncate(self.fd, HEADER.size + GROW * RECORD.size)
+            os.pwrite(self.fd, HEADER.pack(MAGIC, 0, 0), 0)
+        self.map = None
+        self._remap()
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a balance table")
+
+    def _remap(self):
+        if self.map is not None:
+            self.map.close()
+        self.map = mmap.mmap(self.fd, os.fstat(self.fd).st_size)
+
+    def _offset(self, slot):
+        offset = HEADER.size + slot * RECORD.size
+        if offset + RECORD.size > len(self.map):
+            # another process may have grown the file
+            self._remap()
+            if offset + RECORD.size > len(self.map):
+                raise IndexError(f"No balance slot {slot}")
+        return offset
+
+    def slots(self):
+        return struct.unpack_from("<q", self.map, SLOTS_AT)[0]
+
+    def changes(self):
+        """A counter bumped by every write, from any process."""
+        return struct.unpack_from("<q", self.map, CHANGES_AT)[0]
+
+    def allocate(self, count=1):
+        """Reserve ``count`` new slots; returns the first. Call under the commit lock."""
+        with self.lock:
+            first = self.slots()
+            self._fit(first + count)
+            struct.pack_into("<q", self.map, SLOTS_AT, first + count)
+            return first
+
+    def _fit(self, count):
+        needed = HEADER.size + count * RECORD.size
+        if needed > os.fstat(self.fd).st_size:
+            os.ftruncate(self.fd, needed + GROW * RECORD.size)
+        if needed > len(self.map):
+            self._remap()
+
+    def _consistent(self, read):
+        # call with self.lock held
+        for _ in range(READ_TRIES):
+            before = self.changes()
+            if before % 2 == 0:
+                result = read()
+                if self.changes() == before:
+                    return result
+            time.sleep(0)
+        return read()
+
+    def read(self, slot):
+        """(balance in minor units, version) of ``slot``."""
+        with self.lock:
+            offset = self._offset(slot)
+            return self._consistent(lambda: RECORD.unpack_from(self.map, offset))
+
+    def read_all(self):
+        """(balance, version) of every slot in use, in slot order."""
+        with self.lock:
+            count = self.slots()
+            if count:
+                self._offset(count - 1)
+            data = self._consistent(lambda: self.map[HEADER.size:HEADER.size + count * RECORD.size])
+            return RECORD.iter_unpack(data)
+
+    def _begin(self):
+        # the counter is even between writes; round up after a dead writer
+        changes = self.changes()
+        changes += 1 + changes % 2
+        struct.pack_into("<q", self.map, CHANGES_AT, changes)
+        return changes + 1
+
+    def write(self, slot, minor, version):
+        """Overwrite one record in place. Call under the commit lock."""
+        with self.lock:
+            offset = self._offset(slot)
+            done = self._begin()
+            RECORD.pack_into(self.map, offset, minor, version)
+            struct.pack_into("<q", self.map, CHANGES_AT, done)
+            self._synced(offset)
+
+    def write_many(self, records):
+        """
+        Overwrite the (slot, minor, version) ``records`` in place as one
+        change, synced once. Call under the commit lock.
+        """
+        if not records:
+            return
+        with self.lock:
+            offsets = [self._offset(slot) for slot, _, _ in records]
+            done = self._begin()
+            for offset, (_, minor, version) in zip(offsets, records):
+                RECORD.pack_into(self.map, offset, minor, version)
+            struct.pack_into("<q", self.map, CHANGES_AT, done)
+            if self.sync == "always":
+                self.map.flush()
+            else:
+                self._synced(0)
+
+    def replace(self, records):
+        """
+        Make ``records`` ((minor, version) pairs) the whole table, slot 0
+        onwards, in one go. Call under the commit lock.
+        """
+        count = len(records)
+        data = b"".join(RECORD.pack(minor, version) for minor, version in records)
+        with self.lock:
+            self._fit(count)
+            # the file is never shrunk (other processes may have it mapped),
+            # so zero the slots no longer used
+            end = HEADER.size + max(self.slots(), count) * RECORD.size
+            done = self._begin()
+            self.map[HEADER.size:end] = data + bytes(end - HEADER.size - len(data))
+            HEADER.pack_into(self.map, 0, MAGIC, count, done)
+            if self.sync != "never":
+                self.map.flush()
+
+    def _synced(self, offset):
+        if self.sync == "always":
+            # msync works on whole pages: the record's and the header's
+            start = offset - offset % mmap.PAGESIZE
+            self.map.flush(start, min(mmap.PAGESIZE, len(self.map) - start))
+            if start:
+                self.map.flush(0, mmap.PAGESIZE)
+        elif self.sync == "interval":
+            now = time.monotonic()
+            if now - self.synced >= self.interval:
+                self.map.flush()
+                self.synced = now
+
+    def flush(self):
+        with self.lock:
+            self.map.flush()
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.flush()
+                self.map.close()
+                self.map = None
+                os.close(self.fd)
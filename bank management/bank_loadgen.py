@@ -0,0 +1,131 @@
+"""
+Load generator for bank_server.py.
+
+Creates a few accounts through the server and logs in to each, then keeps
+``--concurrency`` keep-alive connections busy with random deposits and
+withdrawals until ``--requests`` have been answered, and reports throughput
+and latency percentiles. With --pin every request carries the PIN instead of
+the session token, to see what checking it each time costs. Start the server
+first, on a scratch data file, with the account limits off (limits.py): a
+few accounts taking thousands of requests would soon hit them.
+
+How to run:
+    BANK_LIMITS=0 python bank_server.py --data /tmp/load.json &
+    python bank_loadgen.py --concurrency 50 --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection to the server."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def post(self, path, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode("utf-8")
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+            + payload)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+async def worker(client, accounts, remaining, latencies, errors, rng):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        account_no, auth = rng.choice(accounts)
+        path = "/deposit" if rng.random() < 0.6 else "/withdraw"
+        start = time.perf_counter()
+        status, response = await client.post(path, dict(auth, accountNo=account_no,
+                                                        amount=rng.randint(1, 100)))
+        latencies.append(time.perf_counter() - start)
+        # insufficient balance is a normal answer, anything else is not
+        if status != 200 and response.get("error") != "Insufficient balance.":
+            errors.append(response.get("error"))
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    setup = Client(args.host, args.port)
+    accounts = []
+    for i in range(args.accounts):
+        status, response = await setup.post("/accounts", {
+            "name": f"Load {i}", "age": 30, "email": f"load{i}@example.com", "pin": "1234"})
+        if status != 200:
+            raise SystemExit(f"could not create accounts: {response}")
+        account_no = response["account"]["accountNo"]
+        if args.pin:
+            accounts.append((account_no, {"pin": "1234"}))
+            continue
+        status, response = await setup.post("/login", {"accountNo": account_no, "pin": "1234"})
+        if status != 200:
+            raise SystemExit(f"could not log in: {response}")
+        accounts.append((account_no, {"token": response["token"]}))
+    setup.close()
+
+    clients = [Client(args.host, args.port) for _ in range(args.concurrency)]
+    remaining = [args.requests]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, accounts, remaining, latencies, errors, random.Random(rng.random()))
+        for client in clients))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.close()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.concurrency} connections in {elapsed:.2f}s: "
+          f"{len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms")
+    if errors:
+        print(f"{len(errors)} errors, e.g. {errors[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deposit/withdraw load against bank_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=20, help="open connections")
+    parser.add_argument("--requests", type=int, default=10000, help="total requests")
+    parser.add_argument("--accounts", type=int, default=100, help="accounts to spread the load over")
+    parser.add_argument("--pin", action="store_true", help="send the PIN with every request instead of logging in")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
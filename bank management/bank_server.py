@@ -0,0 +1,234 @@
+"""
+JSON-over-HTTP bank service.
+
+Serves the account operations of the Streamlit app (operations.py) to other
+programs with nothing but the standard library: an asyncio server speaking
+just enough HTTP/1.1 (keep-alive, Content-Length bodies) for JSON clients.
+
+The accounts are kept in memory and changes are written by a background
+thread (see write_behind.py), so a request never waits for the disk. With
+--group-commit MS a request is answered only once its change is on disk;
+the changes arriving within MS milliseconds are written together. Only run
+one server per data file, and don't use the Streamlit app on the same file
+at the same time.
+
+Endpoints (POST with a JSON body, answers {"ok": ..., "account"/"error": ...}):
+    /accounts   {"name", "age", "email", "pin"}       create an account
+    /login      {"accountNo", "pin"}                  answers {"ok", "token"}
+    /logout     {"token"}
+    /deposit    {"accountNo", "pin", "amount"}
+    /withdraw   {"accountNo", "pin", "amount"}
+    /update     {"accountNo", "pin", "name"?, "email"?, "new_pin"?}
+    /delete     {"accountNo", "pin"}
+    GET /health                                        account count, unwritten changes
+    GET /metrics                                       latencies, Prometheus text format
+
+Instead of "pin", the account endpoints accept the "token" from /login, which
+saves checking the PIN (slow on purpose) on every request.
+
+How to run:
+    python bank_server.py --port 8080
+    curl -d '{"name": "A", "age": 30, "email": "a@x.io", "pin": "1234"}' localhost:8080/accounts
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import banking
+import metrics
+import operations
+from storage import open_backend
+from write_behind import WriteBehindBackend
+
+MAX_BODY = 64 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def public(acct):
+    return {k: v for k, v in acct.items() if k not in ("pin_hash", "transactions", "version", "activity")}
+
+
+def field(body, name, convert=str, required=True):
+    value = body.get(name)
+    if value is None or value == "":
+        if required:
+            raise BadRequest(f"Missing field {name!r}.")
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError, OverflowError):
+        raise BadRequest(f"Invalid value for {name!r}.") from None
+
+
+def credential(body):
+    return body.get("token") or field(body, "pin")
+
+
+def money(value):
+    if isinstance(value, bool):
+        raise ValueError(value)
+    # to whole minor units, e.g. 10.005 -> 10.01 (see banking.money)
+    return banking.money(float(value))
+
+
+def logout(token):
+    operations.logout(token)
+    return True, None
+
+
+# each handler takes the backend and the request body and returns (ok, result)
+ROUTES = {
+    "/accounts": lambda backend, body: operations.create_account(
+        backend, field(body, "name"), field(body, "age", int), field(body, "email"),
+        field(body, "pin")),
+    "/login": lambda backend, body: operations.login(
+        backend, field(body, "accountNo"), field(body, "pin")),
+    "/logout": lambda backend, body: logout(field(body, "token")),
+    "/deposit": lambda backend, body: operations.deposit(
+        backend, field(body, "accountNo"), credential(body), field(body, "amount", money)),
+    "/withdraw": lambda backend, body: operations.withdraw(
+        backend, field(body, "accountNo"), credential(body), field(body, "amount", money)),
+    "/update": lambda backend, body: operations.update_account(
+        backend, field(body, "accountNo"), credential(body), field(body, "name", required=False),
+        field(body, "email", required=False), field(body, "new_pin", required=False)),
+    "/delete": lambda backend, body: operations.delete_account(
+        backend, field(body, "accountNo"), credential(body)),
+}
+
+
+class BankServer:
+    def __init__(self, backend):
+        self.backend = backend
+        self.requests = 0
+        # with group commit a change waits until its batch is written: every
+        # change runs in a thread, enough of them for a whole batch to wait
+        # together
+        self.executor = ThreadPoolExecutor(backend.max_batch) if backend.durable else None
+
+    def handle(self, method, path, body):
+        """Return (status, response dict) for one request."""
+        if path == "/health":
+            return 200, {"ok": True, "accounts": len(self.backend.load()),
+                         "pending": self.backend.pending(), "writes": self.backend.writes}
+        if path == "/metrics":
+            return 200, metrics.prometheus_text()
+        route = ROUTES.get(path)
+        if route is None:
+            return 404, {"ok": False, "error": f"No such endpoint {path!r}."}
+        if method != "POST":
+            return 405, {"ok": False, "error": "Use POST."}
+        try:
+            body = json.loads(body or b"{}")
+            if not isinstance(body, dict):
+                raise BadRequest("Expected a JSON object.")
+            ok, result = route(self.backend, body)
+        except (BadRequest, ValueError) as e:
+            return 400, {"ok": False, "error": str(e)}
+        except Exception as e:
+            return 500, {"ok": False, "error": f"Failed to access data: {e}"}
+        if not ok:
+            return 400, {"ok": False, "error": result}
+        if path == "/login":
+            return 200, {"ok": True, "token": result}
+        return 200, {"ok": True, "account": None if result is None else public(result)}
+
+    async def respond(self, method, path, body):
+        if path in ROUTES and (self.executor is not None or b'"token"' not in body):
+            # checking a PIN or hashing a new one runs scrypt, slow on purpose:
+            # do it in a worker thread so other connections are served meanwhile
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.handle, method, path, body)
+        return self.handle(method, path, body)
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, response = 413, {"ok": False, "error": "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = await self.respond(method, target.split("?", 1)[0], body)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                self.requests += 1
+
+                if isinstance(response, str):
+                    payload, content_type = response.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    payload, content_type = json.dumps(response).encode("utf-8"), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away
+        finally:
+            writer.close()
+
+
+async def serve(backend, host, port):
+    app = BankServer(backend)
+    server = await asyncio.start_server(app.serve_client, host, port)
+    print(f"serving {len(backend.load())} accounts on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the bank operations as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--metrics-file", help="keep the latency metrics in this file (Prometheus text)")
+    parser.add_argument("--group-commit", type=float, metavar="MS",
+                        help="answer only once changes are written, writing those within MS ms together")
+    args = parser.parse_args()
+
+    if args.metrics_file:
+        metrics.export_every(args.metrics_file)
+
+    inner = open_backend(args.data, key="accountNo", kind=args.backend)
+    if args.group_commit is None:
+        backend = WriteBehindBackend(inner)
+    else:
+        backend = WriteBehindBackend(inner, max_batch=100, window=args.group_commit / 1000, durable=True)
+    try:
+        asyncio.run(serve(backend, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"writing {backend.pending()} queued changes")
+        backend.flush()
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Banking rules shared by the Streamlit app and the batch tools.
+
+Nothing in here touches Streamlit or storage: these are the helpers and the
+validation rules every front-end must apply the same way, including how PINs
+are hashed and checked.
+"""
+
+import hashlib
+import hmac
+import math
+import secrets
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from metrics import timed
+
+DEPOSIT_LIMIT = 10000
+# how each transaction type changes the balance
+TX_SIGNS = {"deposit": 1, "withdraw": -1, "interest": 1, "fee": -1}
+# minor units (cents) per unit of money
+MINOR_UNITS = 100
+
+
+# scrypt work factors: about 50-100 ms per PIN check on purpose, so guessing
+# 4-digit PINs from a stolen data file is slow
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+
+@timed("hash_pin")
+def hash_pin(pin: str) -> str:
+    """The old unsalted SHA-256 PIN hash; only used to check existing hashes."""
+    return hashlib.sha256(pin.encode("utf-8")).hexdigest()
+
+
+@timed("make_pin_hash")
+def make_pin_hash(pin: str) -> str:
+    """Salted scrypt hash of ``pin`` as "scrypt$n$r$p$salt$hash"."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(pin.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+@timed("verify_pin_hash")
+def verify_pin_hash(stored: str, pin: str) -> bool:
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(hash_pin(pin), stored)
+    _, n, r, p, salt, digest = stored.split("$")
+    computed = hashlib.scrypt(pin.encode("utf-8"), salt=bytes.fromhex(salt),
+                              n=int(n), r=int(r), p=int(p), dklen=len(digest) // 2)
+    return hmac.compare_digest(computed.hex(), digest)
+
+
+def check_pin(acct, pin):
+    """
+    Check ``pin`` against an account of either app; returns (ok, upgraded).
+    Accounts still using the old SHA-256 hash, or the CLI's plaintext "pin",
+    are upgraded in place to a scrypt "pin_hash" when the PIN is right, and
+    ``upgraded`` tells the caller there is a change to save.
+    """
+    pin = str(pin)
+    stored = acct.get("pin_hash")
+    if stored is not None:
+        ok = verify_pin_hash(stored, pin)
+    else:
+        ok = "pin" in acct and hmac.compare_digest(str(acct["pin"]), pin)
+    if ok and not (stored or "").startswith(f"scrypt${SCRYPT_N}$"):
+        acct.pop("pin", None)
+        acct["pin_hash"] = make_pin_hash(pin)
+        return True, True
+    return ok, False
+
+
+def to_minor(amount):
+    """``amount`` in whole minor units, rounded half up (0.105 -> 11)."""
+    # str() gives the shortest repr of a float, so 0.1 is read as exactly 0.1
+    return int((Decimal(str(amount)) * MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+
+
+def from_minor(minor):
+    return minor / MINOR_UNITS
+
+
+def money(amount):
+    """
+    ``amount`` rounded to a whole number of minor units. Raises ValueError
+    for amounts that are not finite (inf, nan, or too large to be a float).
+    """
+    if not math.isfinite(amount):
+        raise ValueError("Amount must be a finite number.")
+    return from_minor(to_minor(amount))
+
+
+def add_money(balance, amount):
+    """
+    ``balance + amount`` computed in minor units, so repeated deposits and
+    withdrawals of amounts like 0.1 do not drift (0.1 + 0.2 != 0.3 in floats).
+    """
+    return from_minor(to_minor(balance) + to_minor(amount))
+
+
+def add_transaction(acct, ttype, amount):
+    acct.setdefault("transactions", [])
+    tx = {
+        "type": ttype,
+        "amount": amount,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+    acct["transactions"].append(tx)
+    return tx
+
+
+def check_deposit(acct, amount):
+    """Return an error message, or None if the deposit is allowed."""
+    if amount <= 0 or amount > DEPOSIT_LIMIT:
+        return f"Deposit amount must be between {from_minor(1)} and {DEPOSIT_LIMIT}."
+    return None
+
+
+def check_withdraw(acct, amount):
+    """Return an error message, or None if the withdrawal is allowed."""
+    if amount <= 0:
+        return "Withdrawal amount must be greater than 0."
+    if acct["balance"] < amount:
+        return "Insufficient balance."
+    return None
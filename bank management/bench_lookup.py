@@ -0,0 +1,61 @@
+"""
+Benchmark: account lookup latency as the number of accounts grows.
+
+Compares AccountStore.get (dict index) against the old linear scan over a
+list of account dicts. The indexed lookup should stay flat from 1k to 1M
+accounts while the scan grows with the account count.
+
+How to run:
+    python bench_lookup.py
+    python bench_lookup.py --sizes 1000 10000 --lookups 5000
+"""
+
+import argparse
+import random
+import time
+
+from account_store import AccountStore
+
+
+def make_accounts(n):
+    return [{"accountNo": f"AC{i:06d}", "name": f"user {i}", "balance": 0} for i in range(n)]
+
+
+def linear_find(data, account_no):
+    for acct in data:
+        if acct["accountNo"] == account_no:
+            return acct
+    return None
+
+
+def time_lookups(find, keys):
+    start = time.perf_counter()
+    for key in keys:
+        find(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--scan-limit", type=int, default=100_000,
+                        help="skip the linear scan above this many accounts")
+    args = parser.parse_args()
+
+    print(f"{'accounts':>10} {'index (us)':>12} {'scan (us)':>12}")
+    for n in args.sizes:
+        records = make_accounts(n)
+        store = AccountStore(records)
+        keys = [f"AC{random.randrange(n):06d}" for _ in range(args.lookups)]
+        indexed = time_lookups(store.get, keys)
+        if n <= args.scan_limit:
+            scan_keys = keys[:max(1, args.lookups // 1000)]
+            scan = f"{time_lookups(lambda k: linear_find(records, k), scan_keys) * 1e6:12.2f}"
+        else:
+            scan = f"{'-':>12}"
+        print(f"{n:>10} {indexed * 1e6:12.3f} {scan}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: memory used by accounts as plain dicts vs records.Account.
+
+Builds a sample of accounts with synthetic transaction histories in both
+representations, measures the allocated size with tracemalloc and scales
+the result up to the target account count. 1M accounts with 100
+transactions each is ~100M dict transactions, far more than fits in memory
+on a laptop, so by default a 10k-account sample is measured and
+extrapolated (pass --sample 1000000 to measure it directly).
+
+How to run:
+    python bench_memory.py
+    python bench_memory.py --accounts 1000000 --txs 100 --sample 20000
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+from records import Account
+
+
+def make_account(i, txs):
+    start = datetime(2025, 1, 1)
+    return {
+        "name": f"Customer {i}",
+        "age": 18 + i % 60,
+        "email": f"customer{i}@example.com",
+        "pin_hash": f"{i:064x}",
+        "accountNo": f"AC{i:06d}",
+        "balance": float(i % 10000),
+        "transactions": [
+            {
+                "type": random.choice(("deposit", "withdraw")),
+                "amount": float(random.randint(1, 10000)),
+                "timestamp": (start + timedelta(seconds=j * 3607, microseconds=j)).isoformat() + "Z",
+            }
+            for j in range(txs)
+        ],
+    }
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=1_000_000, help="account count to report for")
+    parser.add_argument("--txs", type=int, default=100, help="transactions per account")
+    parser.add_argument("--sample", type=int, default=10_000, help="accounts actually built")
+    args = parser.parse_args()
+
+    random.seed(1)
+    as_dicts_size, dicts = measure(lambda: [make_account(i, args.txs) for i in range(args.sample)])
+    as_records_size, records = measure(lambda: [Account.from_dict(d) for d in dicts])
+
+    assert all(r.to_dict() == d for r, d in zip(records[:100], dicts))
+
+    scale = args.accounts / args.sample
+    print(f"{args.accounts} accounts x {args.txs} transactions "
+          f"(measured {args.sample}, scaled x{scale:g})")
+    for label, size in (("dicts", as_dicts_size), ("records.Account", as_records_size)):
+        print(f"  {label:<16} {size * scale / 2**30:8.2f} GiB  ({size / args.sample:,.0f} bytes/account)")
+    print(f"  saving           {1 - as_records_size / as_dicts_size:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
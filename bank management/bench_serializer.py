@@ -0,0 +1,80 @@
+"""
+Benchmark: load/save time and file size of the bank data file.
+
+Writes and reads back a synthetic Streamlit-schema account list at each size
+with the stdlib json module and with orjson (if installed), both indented
+(the old format) and compact (the new default).
+
+How to run:
+    python bench_serializer.py
+    python bench_serializer.py --sizes 10000 100000 --history 5
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from account_store import AccountStore
+from banking import add_transaction
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_accounts(n, history):
+    for i in range(n):
+        acct = {"name": f"User {i}", "age": 30, "email": f"user{i}@example.com",
+                "pin_hash": "0" * 64, "accountNo": f"AC{i:06d}", "balance": 0,
+                "transactions": [], "version": history}
+        for _ in range(history):
+            acct["balance"] += 10.5
+            add_transaction(acct, "deposit", 10.5)
+        yield acct
+
+
+def encoders():
+    yield "json indent=2", lambda d: json.dumps(d, indent=2).encode("utf-8"), json.loads
+    yield "json compact", lambda d: json.dumps(d, separators=(",", ":")).encode("utf-8"), json.loads
+    if orjson is not None:
+        yield "orjson indent=2", lambda d: orjson.dumps(d, option=orjson.OPT_INDENT_2), orjson.loads
+        yield "orjson compact", orjson.dumps, orjson.loads
+
+
+def bench(accounts, path, dumps, loads):
+    # a save is serialize + write, a load is read + parse + index, as in
+    # JsonBackend
+    start = time.perf_counter()
+    path.write_bytes(dumps(accounts))
+    save = time.perf_counter() - start
+    start = time.perf_counter()
+    AccountStore(loads(path.read_bytes()))
+    load = time.perf_counter() - start
+    return save, load, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON encoders and layouts for the data file.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--history", type=int, default=3, help="transactions per account")
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("orjson is not installed, only the stdlib is measured (pip install orjson)")
+    path = Path(tempfile.mkdtemp()) / "bank_data.json"
+    print(f"{'accounts':>9} {'encoder':<16} {'save':>9} {'load':>9} {'size':>10}")
+    for n in args.sizes:
+        accounts = list(make_accounts(n, args.history))
+        for name, dumps, loads in encoders():
+            save, load, size = bench(accounts, path, dumps, loads)
+            print(f"{n:>9,} {name:<16} {save:>8.3f}s {load:>8.3f}s {size / 1e6:>8.1f}MB")
+        del accounts
+    path.unlink()
+
+
+if __name__ == "__main__":
+    main()
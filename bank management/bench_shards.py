@@ -0,0 +1,78 @@
+"""
+Benchmark: write latency with 1, 16 and 256 shards.
+
+Fills a sharded data directory with synthetic accounts (each with a few
+transactions), then times single deposits (get_account + put_account) on
+random accounts. With one shard every deposit rewrites all accounts; with N
+shards it rewrites about 1/N of them. Also times the first lookup of an
+account, which only has to read its own shard.
+
+How to run:
+    python bench_shards.py
+    python bench_shards.py --accounts 100000 --shards 1 16 256
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from account_store import AccountStore
+from banking import add_transaction
+from storage import ShardedBackend
+
+
+def make_accounts(n, history=5):
+    for i in range(n):
+        acct = {"name": f"User {i}", "age": 30, "email": f"user{i}@example.com",
+                "pin_hash": "0" * 64, "accountNo": f"AC{i:06d}", "balance": 0, "transactions": []}
+        for _ in range(history):
+            acct["balance"] += 10
+            add_transaction(acct, "deposit", 10)
+        yield acct
+
+
+def bench(count, accounts, writes):
+    path = Path(tempfile.mkdtemp()) / "bank_data.json"
+    ShardedBackend(path, shards=count).save(AccountStore(accounts))
+
+    # a fresh backend, as after a restart: nothing is loaded yet
+    backend = ShardedBackend(path)
+    account_nos = [acct["accountNo"] for acct in accounts]
+    rng = random.Random(0)
+    start = time.perf_counter()
+    backend.get_account(rng.choice(account_nos))
+    first = time.perf_counter() - start
+
+    times = []
+    for _ in range(writes):
+        account_no = rng.choice(account_nos)
+        start = time.perf_counter()
+        acct = backend.get_account(account_no)
+        acct["balance"] += 1
+        backend.put_account(acct, add_transaction(acct, "deposit", 1))
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return first, statistics.mean(times), times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare write latency for different shard counts.")
+    parser.add_argument("--accounts", type=int, default=20000)
+    parser.add_argument("--writes", type=int, default=200, help="deposits timed per shard count")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 16, 256])
+    args = parser.parse_args()
+
+    accounts = list(make_accounts(args.accounts))
+    print(f"{args.accounts} accounts, {args.writes} deposits each run")
+    print(f"{'shards':>7} {'first read':>12} {'mean write':>12} {'p50':>10} {'p99':>10}")
+    for count in args.shards:
+        first, mean, p50, p99 = bench(count, accounts, args.writes)
+        print(f"{count:>7} {first * 1000:>10.2f}ms {mean * 1000:>10.2f}ms "
+              f"{p50 * 1000:>8.2f}ms {p99 * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
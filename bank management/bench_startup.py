@@ -0,0 +1,111 @@
+"""
+Benchmark: how long the CLI (main.py) takes to start.
+
+Measures, each as the median of a few runs in a fresh interpreter:
+
+- import: the cumulative import time of main.py from ``python -X importtime``;
+  importing must not read the data file
+- first prompt: from starting ``python main.py`` until the menu asks for a
+  choice; the data file loads in the background meanwhile
+- first answer: until the answer to a lookup (show details of an account
+  that does not exist), which needs the loaded data
+
+against a synthetic CLI data file with --accounts accounts. With --max-import
+and --max-prompt (milliseconds) it exits with status 1 when a measurement is
+over the limit, so it can guard against startup regressions.
+
+How to run:
+    python bench_startup.py
+    python bench_startup.py --accounts 100000 --max-import 150 --max-prompt 300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+PROMPT = b"tell your response :- "
+ANSWER = b"sorry no data found"
+
+
+def make_data(path, n):
+    accounts = [{"name": f"User {i}", "age": 30, "email": f"user{i}@example.com",
+                 "pin_hash": "0" * 64, "accountNo.": f"AC{i:06d}", "balance": 0}
+                for i in range(n)]
+    path.write_text(json.dumps(accounts), encoding="utf-8")
+
+
+def import_ms(env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=HERE, env=env, capture_output=True, check=True)
+    # "import time: <self us> | <cumulative us> | <module>"
+    for line in result.stderr.decode().splitlines():
+        fields = [f.strip() for f in line.split("|")]
+        if len(fields) == 3 and fields[2] == "main":
+            return int(fields[1]) / 1000
+    raise RuntimeError("main not found in the -X importtime output")
+
+
+def prompt_ms(env, data):
+    """Milliseconds until the menu prompt and until the first answer."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", "main.py", "--data", str(data)], cwd=HERE, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = b""
+    prompt = None
+    while ANSWER not in output:
+        chunk = proc.stdout.read1(4096)
+        if not chunk:
+            raise RuntimeError(f"main.py exited early: {output[-200:]!r}")
+        output += chunk
+        if prompt is None and PROMPT in output:
+            prompt = (time.perf_counter() - start) * 1000
+            # show details of an account that does not exist
+            proc.stdin.write(b"4\nNOSUCH\n1234\n")
+            proc.stdin.flush()
+    answer = (time.perf_counter() - start) * 1000
+    proc.communicate()
+    return prompt, answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the CLI's import time and time to first prompt.")
+    parser.add_argument("--accounts", type=int, default=10_000, help="accounts in the synthetic data file")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is reported)")
+    parser.add_argument("--max-import", type=float, help="fail if importing main takes longer (ms)")
+    parser.add_argument("--max-prompt", type=float, help="fail if the first prompt takes longer (ms)")
+    args = parser.parse_args()
+
+    data = Path(tempfile.mkdtemp()) / "data.json"
+    make_data(data, args.accounts)
+    env = dict(os.environ, BANK_DATA=str(data), BANK_BACKEND="json")
+
+    imports = [import_ms(env) for _ in range(args.repeat)]
+    runs = [prompt_ms(env, data) for _ in range(args.repeat)]
+    results = {
+        "import": statistics.median(imports),
+        "first prompt": statistics.median(r[0] for r in runs),
+        "first answer": statistics.median(r[1] for r in runs),
+    }
+    print(f"{args.accounts:,} accounts, median of {args.repeat} runs")
+    for name, ms in results.items():
+        print(f"{name:>13}: {ms:8.1f} ms")
+
+    failed = [f"{name} {results[name]:.1f} ms > {limit} ms"
+              for name, limit in (("import", args.max_import), ("first prompt", args.max_prompt))
+              if limit is not None and results[name] > limit]
+    for name in data.parent.iterdir():
+        name.unlink()
+    data.parent.rmdir()
+    if failed:
+        raise SystemExit("too slow: " + ", ".join(failed))
+
+
+if __name__ == "__main__":
+    main()
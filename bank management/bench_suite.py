@@ -0,0 +1,300 @@
+"""
+Benchmark suite: the bank operations as the number of accounts grows.
+
+For each size a synthetic data file is generated (seeded, so every run sees
+the same accounts) with a realistic spread of transaction histories, and
+each operation is timed with warmup calls and repetitions:
+
+- the Streamlit app's load_data (a fresh backend, so the file is really
+  read) and load_data on the warm cache, save_data, and the operations in
+  operations.py: create_account, deposit, withdraw, find_user
+- the CLI's Bank: load, depositMoney and showDetails, fed scripted answers
+  instead of keyboard input, on a CLI-schema copy of the same accounts
+
+deposit, withdraw and find_user use a session token, as the app does once
+logged in; "find_user (PIN)" shows the cost of checking a PIN, which is
+scrypt and the same at any size. create_account and the CLI always hash or
+check a PIN. The hourly transaction limit (limits.py) is lifted, since the
+same few accounts are used over and over; the daily withdrawal limit is
+still checked.
+
+Results are printed and can be saved as JSON (--save). Given a saved
+baseline (--baseline), every operation whose median is more than
+--tolerance slower than in the baseline is reported and the exit status is
+1, so the suite can gate a deploy. Generated files are kept in --workdir
+and reused by later runs with the same parameters.
+
+How to run:
+    python bench_suite.py --save baseline.json
+    python bench_suite.py --baseline baseline.json --tolerance 0.25
+    python bench_suite.py --sizes 1000 10000 100000 1000000 --backend sqlite --compact
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import limits
+import operations
+import serializer
+from account_numbers import format_number
+from banking import make_pin_hash
+from storage import BACKENDS
+
+PIN = "1234"
+LOGGED_IN = 20
+OPEN_ACCOUNTS = datetime(2025, 1, 1)
+
+
+def generate(path, n, txs, seed, legacy=False):
+    """Write ``n`` accounts to ``path``, one at a time; histories average ``txs``."""
+    rng = random.Random(seed)
+    # one scrypt hash for everyone: hashing 1M PINs would take hours
+    pin_hash = make_pin_hash(PIN)
+    with open(path, "wb") as fs:
+        fs.write(b"[")
+        for i in range(n):
+            acct = {"name": f"Customer {i}", "age": rng.randint(18, 90),
+                    "email": f"customer{i}@example.com", "pin_hash": pin_hash}
+            acct["accountNo." if legacy else "accountNo"] = format_number(i)
+            balance = 0
+            history = []
+            if not legacy:
+                # most accounts are quiet, a few are very busy
+                count = min(int(rng.expovariate(1 / txs)) if txs else 0, txs * 20)
+                when = OPEN_ACCOUNTS + timedelta(seconds=rng.randint(0, 86400 * 30))
+                for k in range(count):
+                    ttype = "deposit" if k == 0 or rng.random() < 0.6 else "withdraw"
+                    amount = round(rng.uniform(1, 5000 if ttype == "deposit" else balance or 1), 2)
+                    if ttype == "withdraw" and amount > balance:
+                        ttype = "deposit"
+                    balance += amount if ttype == "deposit" else -amount
+                    when += timedelta(seconds=rng.randint(60, 86400 * 7))
+                    history.append({"type": ttype, "amount": amount, "timestamp": when.isoformat() + "Z"})
+            acct["balance"] = round(balance, 2) + 10_000
+            if not legacy:
+                acct["transactions"] = history
+            fs.write((b"," if i else b"") + serializer.dumps(acct))
+        fs.write(b"]")
+
+
+def data_file(workdir, n, txs, seed, legacy=False):
+    path = workdir / f"{'cli' if legacy else 'app'}-{n}-{txs}-{seed}.json"
+    if not path.exists():
+        generate(path.with_suffix(".tmp"), n, txs, seed, legacy)
+        path.with_suffix(".tmp").replace(path)
+    return path
+
+
+def fresh_backend(path, kind, key="accountNo", compact=False):
+    # a new instance starts with an empty cache, unlike open_backend()'s
+    # shared ones
+    if kind == "sqlite":
+        return BACKENDS[kind](path.with_suffix(".db"), key)
+    if kind == "journal":
+        return BACKENDS[kind](path, key)
+    return BACKENDS[kind](path, key, compact=compact)
+
+
+def copy(source, path, kind, key):
+    """Put the accounts of JSON file ``source`` into a ``kind`` backend at ``path``."""
+    if kind == "json":
+        shutil.copyfile(source, path)
+    else:
+        fresh_backend(path, kind, key).save(fresh_backend(source, "json", key).load())
+
+
+def measure(call, warmup, repeat, budget):
+    """Run ``call`` warmup times, then time it up to ``repeat`` times (at
+    least 3) within ``budget`` seconds. Returns the times in milliseconds."""
+    for _ in range(warmup):
+        call()
+    times = []
+    deadline = time.perf_counter() + budget
+    while len(times) < repeat and (len(times) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def summarize(times):
+    times = sorted(times)
+    return {"runs": len(times), "min_ms": times[0], "median_ms": statistics.median(times),
+            "p95_ms": times[min(len(times) - 1, int(len(times) * 0.95))],
+            "mean_ms": statistics.fmean(times)}
+
+
+def app_operations(path, kind, compact, rng):
+    """(name, callable) for the Streamlit app's operations on ``path``."""
+    backend = fresh_backend(path, kind, compact=compact)
+    store = backend.load()
+    numbers = [acct["accountNo"] for acct in store]
+    tokens = {}
+    for account_no in rng.sample(numbers, min(LOGGED_IN, len(numbers))):
+        tokens[account_no] = operations.login(backend, account_no, PIN)[1]
+    logged_in = list(tokens)
+    counter = iter(range(10**9))
+
+    def check(result):
+        ok, message = result
+        if not ok:
+            raise RuntimeError(message)
+
+    def load_cold():
+        fresh_backend(path, kind, compact=compact).load()
+
+    def create():
+        i = next(counter)
+        check(operations.create_account(backend, f"New {i}", 30, f"new{i}@example.com", PIN))
+
+    def deposit():
+        no = rng.choice(logged_in)
+        check(operations.deposit(backend, no, tokens[no], 10.0))
+
+    def withdraw():
+        no = rng.choice(logged_in)
+        check(operations.withdraw(backend, no, tokens[no], 1.0))
+
+    def find():
+        no = rng.choice(logged_in)
+        if operations.find_user(backend, no, tokens[no]) is None:
+            raise RuntimeError(f"{no} not found")
+
+    def find_pin():
+        if operations.find_user(backend, rng.choice(numbers), PIN) is None:
+            raise RuntimeError("not found")
+
+    return [
+        ("load_data", load_cold),
+        ("load_data (cached)", backend.load),
+        ("save_data", lambda: backend.save(backend.load())),
+        ("create_account", create),
+        ("deposit", deposit),
+        ("withdraw", withdraw),
+        ("find_user", find),
+        ("find_user (PIN)", find_pin),
+    ]
+
+
+def cli_operations(path, kind, rng):
+    """(name, callable) for the CLI's Bank methods, answering its prompts."""
+    import main
+
+    bank = main.Bank
+    bank.database = str(path)
+    bank._backend, bank._data = fresh_backend(path, kind, key="accountNo."), None
+    numbers = [acct["accountNo."] for acct in bank.load()]
+    answers = []
+    # the CLI asks with input(); a module global shadows the builtin
+    main.input = lambda prompt="": answers.pop(0)
+
+    def load_cold():
+        bank._backend, bank._data = fresh_backend(path, kind, key="accountNo."), None
+        bank.load()
+
+    def run(method, *replies):
+        answers[:] = list(replies)
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            method(bank())
+
+    return [
+        ("Bank.load", load_cold),
+        ("Bank.depositMoney", lambda: run(bank.depositMoney, rng.choice(numbers), PIN, "10")),
+        ("Bank.showDetails", lambda: run(bank.showDetails, rng.choice(numbers), PIN)),
+    ]
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Rows of (accounts, operation, baseline ms, now ms, ratio) slower than
+    allowed: by more than ``tolerance`` and by more than ``min_delta`` ms (so
+    timer noise on microsecond operations is not a regression).
+    """
+    before = {(r["accounts"], r["operation"]): r["median_ms"] for r in baseline["results"]}
+    slower = []
+    for r in results:
+        old = before.get((r["accounts"], r["operation"]))
+        if old and r["median_ms"] > old * (1 + tolerance) and r["median_ms"] - old > min_delta:
+            slower.append((r["accounts"], r["operation"], old, r["median_ms"], r["median_ms"] / old))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the bank operations at growing account counts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--txs", type=int, default=10, help="average transactions per account")
+    parser.add_argument("--backend", default="json", choices=list(BACKENDS))
+    parser.add_argument("--compact", action="store_true", help="cache JSON accounts as slotted records")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=10.0,
+                        help="seconds per operation after which fewer repetitions are run (min 3)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=str(Path(tempfile.gettempdir()) / "bank_bench"),
+                        help="where generated data files are kept between runs")
+    parser.add_argument("--no-cli", action="store_true", help="skip the CLI's Bank methods")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.1,
+                        help="slowdowns smaller than this many ms are never reported")
+    args = parser.parse_args()
+
+    limits.configure(hourly_transactions=None, daily_withdrawal=10**9)
+    workdir = Path(args.workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    results = []
+    print(f"{'accounts':>9} {'operation':<20} {'runs':>5} {'median':>10} {'p95':>10}")
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        run_dir = Path(tempfile.mkdtemp(dir=workdir))
+        try:
+            # work on a copy so every run starts from the same data
+            path = run_dir / "bank_data.json"
+            copy(data_file(workdir, n, args.txs, args.seed), path, args.backend, "accountNo")
+            suites = app_operations(path, args.backend, args.compact, rng)
+            if not args.no_cli:
+                cli_path = run_dir / "data.json"
+                copy(data_file(workdir, n, 0, args.seed, legacy=True), cli_path, args.backend, "accountNo.")
+                suites += cli_operations(cli_path, args.backend, rng)
+            for name, call in suites:
+                row = {"accounts": n, "operation": name,
+                       **summarize(measure(call, args.warmup, args.repeat, args.budget))}
+                results.append(row)
+                print(f"{n:>9,} {name:<20} {row['runs']:>5} {row['median_ms']:>8.3f}ms {row['p95_ms']:>8.3f}ms")
+        finally:
+            shutil.rmtree(run_dir)
+
+    report = {"meta": {"date": datetime.now(timezone.utc).isoformat(), "python": sys.version.split()[0],
+                       "platform": platform.platform(), "serializer": serializer.NAME,
+                       "backend": args.backend, "compact": args.compact, "txs": args.txs,
+                       "seed": args.seed, "warmup": args.warmup, "repeat": args.repeat},
+              "results": results}
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"results written to {args.save}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        slower = compare(results, baseline, args.tolerance, args.min_delta)
+        for n, name, old, new, ratio in slower:
+            print(f"SLOWER {n:>9,} {name:<20} {old:8.3f}ms -> {new:8.3f}ms ({ratio:.2f}x)")
+        if slower:
+            raise SystemExit(f"{len(slower)} operations slower than the baseline by more than "
+                             f"{args.tolerance:.0%}")
+        print(f"no operation slower than the baseline by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Bulk ingest of end-of-day deposit and withdrawal batches.
+
+A batch file is CSV with an ``accountNo,type,amount`` header, or JSON Lines
+with one {"accountNo": ..., "type": ..., "amount": ...} object per line
+(.jsonl / .ndjson). Rows are streamed, checked with the same rules as the
+Streamlit app (banking.check_deposit / check_withdraw and the withdrawal and
+velocity limits of limits.py), applied in memory and persisted with one
+put_accounts() call per checkpoint, not one save per row; without
+checkpoints everything is committed at the end, still without holding the
+rows. A checkpoint whose accounts were changed by someone else in the
+meantime has its transactions applied again to fresh copies of the accounts
+(re-checked: rows that no longer pass are rejected) and committed again.
+
+--no-limits exempts a batch from the limits (e.g. a bank's own corrections);
+its transactions still count towards them afterwards.
+
+How to run:
+    python bulk_ingest.py batch.csv
+    python bulk_ingest.py batch.jsonl --checkpoint 10000 --results results.csv
+    python bulk_ingest.py corrections.csv --no-limits
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import time
+from pathlib import Path
+
+import limits
+from banking import add_money, add_transaction, check_deposit, check_withdraw, money
+from storage import ConflictError, open_backend
+
+CHECKS = {
+    "deposit": (check_deposit, 1),
+    "withdraw": (check_withdraw, -1),
+}
+
+
+def read_rows(path):
+    """Yield (line number, row dict) from a CSV or JSON Lines batch file."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8", newline="") as fs:
+        if path.suffix in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(fs, 1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            reader = csv.DictReader(fs)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def apply_one(acct, ttype, amount, check_limits=True, tx=None):
+    """
+    Check and apply one transaction to ``acct`` in memory (``tx`` if given,
+    else a new one). Returns (error message, None) or (None, transaction).
+    """
+    check, sign = CHECKS[ttype]
+    error = check(acct, amount)
+    if not error and check_limits:
+        error = limits.check(acct, ttype, amount)
+    if error:
+        return error, None
+    acct["balance"] = add_money(acct["balance"], sign * amount)
+    if tx is None:
+        tx = add_transaction(acct, ttype, amount)
+    limits.record(acct, tx)
+    return None, tx
+
+
+def apply_rows(backend, rows, check_limits=True):
+    """
+    Check and apply ``rows`` in memory (against the limits too, unless
+    ``check_limits`` is false). Returns the per-row results and the changed
+    accounts as (acct, [new transactions], [their results]).
+    """
+    results = []
+    pending = {}  # account number -> (acct, [new transactions], [their results])
+    for line_no, row in rows:
+        account_no = str(row.get("accountNo", "")).strip()
+        ttype = str(row.get("type", "")).strip().lower()
+        result = {"row": line_no, "accountNo": account_no, "type": ttype, "ok": False}
+        results.append(result)
+
+        try:
+            amount = money(float(row.get("amount")))
+        except (TypeError, ValueError, OverflowError):
+            result["message"] = "Invalid amount."
+            continue
+        if ttype not in CHECKS:
+            result["message"] = f"Unknown transaction type {ttype!r}."
+            continue
+        # accounts touched earlier in this chunk are not saved yet
+        entry = pending.get(account_no)
+        acct = entry[0] if entry else backend.get_account(account_no)
+        if acct is None:
+            result["message"] = "Account not found."
+            continue
+        error, tx = apply_one(acct, ttype, amount, check_limits)
+        if error:
+            result["message"] = error
+            continue
+        if entry is None:
+            entry = pending[account_no] = (acct, [], [])
+        entry[1].append(tx)
+        entry[2].append(result)
+        result.update(ok=True, message="OK", balance=acct["balance"])
+    return results, list(pending.values())
+
+
+def reapply(backend, changed, check_limits=True):
+    """
+    Apply the transactions of ``changed`` (from apply_rows()) again to fresh
+    copies of their accounts, after a conflicting commit, updating their
+    results. Returns the new ``changed``.
+    """
+    again = []
+    for acct, txs, results in changed:
+        fresh = backend.get_account(acct[backend.key])
+        entry = (fresh, [], [])
+        for tx, result in zip(txs, results):
+            if fresh is None:
+                error = "Account not found."
+            else:
+                error, _ = apply_one(fresh, tx["type"], tx["amount"], check_limits, tx)
+            if error:
+                result.update(ok=False, message=error)
+                result.pop("balance", None)
+                continue
+            entry[1].append(tx)
+            entry[2].append(result)
+            result["balance"] = fresh["balance"]
+        if entry[1]:
+            again.append(entry)
+    return again
+
+
+def chunks(rows, size):
+    """
+    Split ``rows`` into iterators of ``size`` rows (all of them for 0),
+    without reading ahead: use up each one before taking the next.
+    """
+    rows = iter(rows)
+    if not size:
+        yield rows
+        return
+    for first in rows:
+        yield itertools.chain([first], itertools.islice(rows, size - 1))
+
+
+def ingest(backend, rows, checkpoint=0, retries=5, check_limits=True):
+    """
+    Apply ``rows`` to the accounts in ``backend`` and return one result dict
+    per row. Changes are committed every ``checkpoint`` rows (0 = only once,
+    at the end). If another writer changed one of the accounts before a
+    commit, the chunk's transactions are applied again to fresh copies (see
+    reapply()), up to ``retries`` times. With ``check_limits`` false the rows
+    are not checked against the limits.
+    """
+    results = []
+    for chunk in chunks(rows, checkpoint):
+        chunk_results, changed = apply_rows(backend, chunk, check_limits)
+        for _ in range(retries):
+            try:
+                if changed:
+                    backend.put_accounts([(acct, txs) for acct, txs, _ in changed])
+            except ConflictError:
+                changed = reapply(backend, changed, check_limits)
+                continue
+            break
+        else:
+            raise ConflictError(f"Gave up after {retries} conflicting commits at row {chunk_results[0]['row']}.")
+        results.extend(chunk_results)
+    return results
+
+
+def write_results(results, path):
+    with open(path, "w", encoding="utf-8", newline="") as fs:
+        writer = csv.DictWriter(fs, ["row", "accountNo", "type", "ok", "message", "balance"])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a batch file of deposits and withdrawals.")
+    parser.add_argument("batch", help="CSV or JSON Lines file of operations")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--checkpoint", type=int, default=0,
+                        help="persist every N rows (default: once at the end)")
+    parser.add_argument("--results", help="write per-row results to this CSV file")
+    parser.add_argument("--no-limits", action="store_true",
+                        help="do not check the rows against the withdrawal and velocity limits")
+    args = parser.parse_args()
+
+    backend = open_backend(args.data, key="accountNo", kind=args.backend)
+    start = time.perf_counter()
+    results = ingest(backend, read_rows(args.batch), args.checkpoint, check_limits=not args.no_limits)
+    elapsed = time.perf_counter() - start
+
+    applied = sum(1 for r in results if r["ok"])
+    print(f"{len(results)} rows: {applied} applied, {len(results) - applied} rejected "
+          f"in {elapsed:.2f}s ({len(results) / max(elapsed, 1e-9):,.0f} rows/s)")
+    if args.results:
+        write_results(results, args.results)
+        print(f"results written to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
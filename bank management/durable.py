@@ -0,0 +1,54 @@
+"""
+Writes that survive a crash of the machine, not just of the process.
+
+write_durably() replaces a whole file; append_durably() adds to one (the
+segment files, the activity log). Both fsync the data, and the directory when
+a file was created or renamed into it, before they return.
+"""
+
+import os
+from pathlib import Path
+
+
+def fsync_directory(directory):
+    """Make the names of the files in ``directory`` durable."""
+    if hasattr(os, "O_DIRECTORY"):  # not on Windows, which has no directory fsync
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_durably(path, data):
+    """
+    Replace ``path`` with ``data`` atomically: write a temp file, fsync it,
+    rename it over ``path`` and fsync the directory, so after a crash the
+    file holds either the old or the new data, and the new data once this
+    returns.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fs:
+        fs.write(data)
+        fs.flush()
+        os.fsync(fs.fileno())
+    os.replace(tmp, path)
+    fsync_directory(path.parent)
+
+
+def append_durably(path, data, truncate=None):
+    """
+    Append ``data`` to ``path`` and fsync it. With ``truncate``, the file is
+    first cut back to that many bytes (a line left unfinished by a crash).
+    """
+    path = Path(path)
+    created = not path.exists()
+    with open(path, "ab") as fs:
+        if truncate is not None and fs.tell() > truncate:
+            fs.truncate(truncate)
+        fs.write(data)
+        fs.flush()
+        os.fsync(fs.fileno())
+    if created:
+        fsync_directory(path.parent)
@@ -0,0 +1,39 @@
+"""
+Export the bank data as indented JSON for people to read.
+
+The data files are written compactly (see serializer.py). This writes every
+account, with its full history, to a separate pretty-printed file. It reads
+through the storage backend, so it works the same for every backend; the
+export is never read back by the apps.
+
+How to run:
+    python export_pretty.py
+    python export_pretty.py --data data.json --key accountNo. --out data.pretty.json
+"""
+
+import argparse
+from pathlib import Path
+
+import serializer
+from storage import open_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a readable, indented copy of the bank data.")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--key", default="accountNo",
+                        help='account number field ("accountNo." for the CLI data)')
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--out", help="output file (default: <data>.pretty.json)")
+    parser.add_argument("--indent", type=int, default=2)
+    args = parser.parse_args()
+
+    data = Path(args.data)
+    out = Path(args.out) if args.out else data.with_name(data.stem + ".pretty.json")
+    accounts = list(open_backend(data, key=args.key, kind=args.backend).iter_accounts())
+    out.write_bytes(serializer.dumps(accounts, indent=args.indent))
+    print(f"exported {len(accounts)} accounts to {out}")
+
+
+if __name__ == "__main__":
+    main()
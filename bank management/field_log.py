@@ -0,0 +1,128 @@
+"""
+Per-account values kept in an append-only log instead of a data file.
+
+Some account fields change with every transaction (limits.py's "activity"),
+and the mapped backend must not rewrite its profile file for them. FieldLog
+keeps such a value per account as one line, [account number, value], appended
+to a log file. Setting a value appends a line; a value of None removes it.
+
+Every process replays the log into a dict and afterwards only reads what was
+appended since (it checks the file's size before each lookup), so other
+processes' changes show up at once. Once the log holds many more lines than
+accounts it is compacted: rewritten with one line per account and renamed
+over the old one, which makes readers replay it from the start. Writers hold
+the backend's commit lock. A line cut short by a crash is ignored and
+overwritten by the next append. Appends and compactions are fsync'ed (see
+durable.py) before they return; with ``sync=False`` that is left to the
+operating system.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import serializer
+from durable import append_durably, write_durably
+
+# compact once the log has this many lines more than twice the live values
+COMPACT_SLACK = 10000
+
+
+class FieldLog:
+    def __init__(self, path, sync=True):
+        self.path = Path(path)
+        self.sync = sync
+        self.lock = threading.Lock()
+        self.values = {}
+        self.lines = 0
+        self.offset = 0
+        self.inode = None
+
+    def _refresh(self):
+        # call with self.lock held
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.values, self.lines, self.offset, self.inode = {}, 0, 0, None
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            # compacted (or replaced) by someone: start over
+            self.values, self.lines, self.offset, self.inode = {}, 0, 0, stat.st_ino
+        if stat.st_size == self.offset:
+            return
+        with open(self.path, "rb") as fs:
+            fs.seek(self.offset)
+            data = fs.read(stat.st_size - self.offset)
+        # only whole lines: the last one may still be being written
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                key, value = serializer.loads(line)
+            except ValueError:
+                continue  # cut short by a crash, then appended to
+            if value is None:
+                self.values.pop(key, None)
+            else:
+                self.values[key] = value
+            self.lines += 1
+        self.offset += end
+
+    def stamp(self):
+        """Changes whenever a value does."""
+        with self.lock:
+            self._refresh()
+            return self.inode, self.offset
+
+    def get(self, key):
+        with self.lock:
+            self._refresh()
+            return self.values.get(key)
+
+    def all(self):
+        """A dict of every value."""
+        with self.lock:
+            self._refresh()
+            return dict(self.values)
+
+    def put_many(self, items):
+        """Set the (key, value) ``items``. Call under the commit lock."""
+        with self.lock:
+            self._refresh()
+            items = [(key, value) for key, value in items if self.values.get(key) != value]
+            if not items:
+                return
+            data = b"".join(serializer.dumps_line([key, value]) for key, value in items)
+            # dropping a line left unfinished by a crash
+            if self.sync:
+                append_durably(self.path, data, truncate=self.offset)
+            else:
+                with open(self.path, "ab") as fs:
+                    if fs.tell() > self.offset:
+                        fs.truncate(self.offset)
+                    fs.write(data)
+            for key, value in items:
+                if value is None:
+                    self.values.pop(key, None)
+                else:
+                    self.values[key] = value
+            self.lines += len(items)
+            self.offset += len(data)
+            if self.lines > 2 * len(self.values) + COMPACT_SLACK:
+                self._write(self.values)
+
+    def replace(self, values):
+        """Make ``values`` (a dict) all there is. Call under the commit lock."""
+        with self.lock:
+            self._write({key: value for key, value in values.items() if value is not None})
+
+    def _write(self, values):
+        # call with self.lock held
+        data = b"".join(serializer.dumps_line([key, value]) for key, value in values.items())
+        if self.sync:
+            write_durably(self.path, data)
+        else:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path)
+        stat = os.stat(self.path)
+        self.values, self.lines, self.offset, self.inode = dict(values), len(values), stat.st_size, stat.st_ino
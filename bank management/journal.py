@@ -0,0 +1,101 @@
+"""
+Append-only journal for the bank data files.
+
+The snapshot is the usual JSON list of accounts. Every change made after the
+snapshot is appended to a sidecar log (``<snapshot>.log``, one JSON object per
+line), so a deposit writes one short line instead of re-serializing every
+account. On startup the snapshot is loaded and the log is replayed on top of
+it; compact() folds the log back into a fresh snapshot.
+
+Log entries are {"op": "put", "record": {...}} (the whole record),
+{"op": "update", "record": {...}, "at": n, "txs": [...]} or
+{"op": "delete", "key": "..."}. An update carries the record without its
+history plus the transactions added to it, which went in at position ``at``,
+so a deposit logs one transaction however long the history is. All three are
+idempotent (an update cuts the history back to ``at`` before adding), so
+replaying a log over a snapshot that already contains it (a crash between the
+snapshot rename and the log removal) gives the same result.
+"""
+
+import os
+from pathlib import Path
+
+import serializer
+
+
+class Journal:
+    def __init__(self, snapshot, key, compact_every=1000):
+        self.snapshot = Path(snapshot)
+        self.log = self.snapshot.with_name(self.snapshot.name + ".log")
+        self.key = key
+        self.compact_every = compact_every
+        self.pending = 0
+
+    def load(self):
+        """Return the list of records: snapshot plus every logged change."""
+        records = {}
+        if self.snapshot.exists():
+            data = self.snapshot.read_bytes()
+            for record in serializer.loads(data) if data.strip() else []:
+                records[record[self.key]] = record
+        else:
+            self.snapshot.write_text("[]", encoding="utf-8")
+
+        self.pending = 0
+        if self.log.exists():
+            good = 0
+            with open(self.log, "rb") as fs:
+                for line in fs:
+                    try:
+                        entry = serializer.loads(line)
+                    except ValueError:
+                        # torn write from a crash, everything after it is lost
+                        break
+                    self._apply(records, entry)
+                    good += len(line)
+                    self.pending += 1
+            if good != self.log.stat().st_size:
+                os.truncate(self.log, good)
+        return list(records.values())
+
+    def _apply(self, records, entry):
+        if entry["op"] == "put":
+            record = entry["record"]
+            records[record[self.key]] = record
+        elif entry["op"] == "update":
+            record = entry["record"]
+            previous = records.get(record[self.key])
+            history = previous.get("transactions", []) if previous is not None else []
+            del history[entry["at"]:]
+            history.extend(entry["txs"])
+            record["transactions"] = history
+            records[record[self.key]] = record
+        elif entry["op"] == "delete":
+            records.pop(entry["key"], None)
+
+    def _append(self, entry):
+        with open(self.log, "ab") as fs:
+            fs.write(serializer.dumps_line(entry))
+        self.pending += 1
+
+    def put(self, record):
+        self._append({"op": "put", "record": record})
+
+    def update(self, record, at, txs):
+        """Log ``record`` (without its history) and the ``txs`` added to its history at ``at``."""
+        self._append({"op": "update", "record": record, "at": at, "txs": txs})
+
+    def delete(self, key):
+        self._append({"op": "delete", "key": key})
+
+    def needs_compaction(self):
+        return self.pending >= self.compact_every
+
+    def compact(self, data):
+        """Write ``data`` as the new snapshot and drop the log."""
+        tmp = self.snapshot.with_name(self.snapshot.name + ".tmp")
+        tmp.write_bytes(serializer.dumps(data))
+        os.replace(tmp, self.snapshot)
+        if self.log.exists():
+            self.log.unlink()
+        self.pending = 0
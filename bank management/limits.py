@@ -0,0 +1,124 @@
+"""
+Rolling withdrawal limits and velocity checks per account.
+
+Two rules, checked by operations.deposit() and withdraw() before a commit:
+
+    daily_withdrawal       at most this much withdrawn (withdrawals and other
+                           money out) in any 24 hours
+    hourly_transactions    at most this many transactions in any hour
+
+A rule set to None is not checked. The rules are RULES, updated from the
+JSON file named by BANK_LIMITS_FILE if set; BANK_LIMITS=0 turns the checks
+off altogether.
+
+Neither check looks at the account's history. Each account carries running
+aggregates in an "activity" field, updated with every transaction and
+committed with the account (so they are versioned like the balance, and as
+durable: the mapped backend keeps them in an fsync'ed side log, see
+field_log.py):
+
+    "activity": {"hours": [[hour, minor], ...], "recent": [micros, ...]}
+
+"hours" holds the money out per hour (hours since the epoch, amounts in
+minor units) for at most the last 24 hours, and "recent" the times of the
+last ``hourly_transactions`` transactions, oldest first, as a bounded deque.
+A check adds up at most 24 buckets and looks at one timestamp, however long
+the history is.
+"""
+
+import json
+import os
+import time
+from collections import deque
+
+from banking import TX_SIGNS, from_minor, to_minor
+from records import iso_to_micros
+
+RULES = {
+    "daily_withdrawal": 5000,
+    "hourly_transactions": 30,
+}
+HOUR_MICROS = 3_600_000_000
+DAY_HOURS = 24
+
+_enabled = os.environ.get("BANK_LIMITS", "1") != "0"
+_rules = None
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(on):
+    global _enabled
+    _enabled = bool(on)
+
+
+def rules():
+    """RULES, with the ones from BANK_LIMITS_FILE applied (read once)."""
+    global _rules
+    if _rules is None:
+        loaded = dict(RULES)
+        path = os.environ.get("BANK_LIMITS_FILE")
+        if path:
+            with open(path, encoding="utf-8") as fs:
+                loaded.update(json.load(fs))
+        _rules = loaded
+    return _rules
+
+
+def configure(**changes):
+    """Change rules for this process, e.g. configure(hourly_transactions=None)."""
+    global _rules
+    _rules = {**rules(), **changes}
+
+
+def _now():
+    return int(time.time() * 1_000_000)
+
+
+def withdrawn_today(acct, now=None):
+    """Money out in the 24 hours before ``now`` (epoch microseconds), in minor units."""
+    now = _now() if now is None else now
+    first = now // HOUR_MICROS - DAY_HOURS + 1
+    return sum(minor for hour, minor in acct.get("activity", {}).get("hours", []) if hour >= first)
+
+
+def check(acct, ttype, amount, now=None):
+    """Return an error message, or None if the transaction is within the limits."""
+    if not _enabled:
+        return None
+    now = _now() if now is None else now
+    limit = rules()
+    activity = acct.get("activity", {})
+    per_hour = limit.get("hourly_transactions")
+    if per_hour is not None:
+        recent = activity.get("recent", [])
+        if per_hour <= 0 or (len(recent) >= per_hour and recent[-per_hour] > now - HOUR_MICROS):
+            return f"Too many transactions in the last hour (at most {per_hour}). Please try again later."
+    daily = limit.get("daily_withdrawal")
+    if daily is not None and TX_SIGNS.get(ttype, 1) < 0:
+        left = to_minor(daily) - withdrawn_today(acct, now)
+        if to_minor(amount) > left:
+            return (f"Daily withdrawal limit of {daily} reached: "
+                    f"you can withdraw up to {from_minor(max(left, 0))} more today.")
+    return None
+
+
+def record(acct, tx):
+    """Add transaction ``tx`` to the account's activity."""
+    if not _enabled:
+        return
+    when = iso_to_micros(tx["timestamp"])
+    activity = acct.get("activity", {})
+    per_hour = rules().get("hourly_transactions")
+    recent = deque(activity.get("recent", []), maxlen=max(per_hour or 0, 0))
+    recent.append(when)
+    hour = when // HOUR_MICROS
+    hours = [[h, minor] for h, minor in activity.get("hours", []) if h > hour - DAY_HOURS]
+    if TX_SIGNS.get(tx["type"], 1) < 0:
+        if hours and hours[-1][0] == hour:
+            hours[-1][1] += to_minor(tx["amount"])
+        else:
+            hours.append([hour, to_minor(tx["amount"])])
+    acct["activity"] = {"hours": hours, "recent": list(recent)}
@@ -11,49 +11,91 @@
 
 
 
-import json
-import random
-import string
+import argparse
+import os
+import threading
 from pathlib import Path
 
+from account_numbers import allocator_for
+from account_store import AccountStore
+from banking import check_pin, make_pin_hash
+from storage import ConflictError, open_backend
+
 
 
 class Bank:
-    database = r'D:\My Code\python yt\bank management\data.json'
-    data = []
-    
-    try:
-        if Path(database).exists():
-            with open(database, 'r', encoding='utf-8') as fs:
-                content = fs.read().strip()
-                if content:
-                    data = json.loads(content)
-                else:
-                    data = []
-        else:
-            # create an empty JSON list file so updates will work later
-            Path(database).write_text("[]", encoding='utf-8')
-            data = []
-    except Exception as err:
-        print(f"The error occur due to {err}")
-        data = []
+    # BANK_DATA (or --data) chooses the data file, by default data.json next
+    # to this script. BANK_BACKEND chooses where accounts live: json (default,
+    # rewrites the whole file), journal (appends to data.json.log), mapped
+    # (balances updated in place in data.balances), sharded (rewrites one of
+    # the files in data.shards) or sqlite (data.db)
+    database = os.environ.get("BANK_DATA", str(Path(__file__).with_name("data.json")))
 
-            
+    # nothing is read when the class is defined; load() opens the data the
+    # first time it is needed (or preload() starts it in the background)
+    _backend = None
+    _data = None
+    _lock = threading.RLock()
+
+    @classmethod
+    def storage(cls):
+        with cls._lock:
+            if cls._backend is None:
+                cls._backend = open_backend(cls.database, key="accountNo.")
+            return cls._backend
+
+    @classmethod
+    def load(cls):
+        with cls._lock:
+            if cls._data is None:
+                try:
+                    # accounts are indexed by account number so lookups do not scan the list
+                    cls._data = cls.storage().load()
+                except Exception as err:
+                    print(f"The error occur due to {err}")
+                    cls._data = AccountStore(key="accountNo.")
+            return cls._data
+
+    @classmethod
+    def preload(cls):
+        # load while the menu is printed and the user is typing
+        threading.Thread(target=cls.load, daemon=True).start()
 
+    @classmethod
+    def __update(cls, record, deleted=False):
+        # True once the change is stored; False if someone else changed the
+        # account first, and then the data is read again on next use, since
+        # ``record`` was already changed in memory
+        try:
+            if deleted:
+                cls.storage().delete_account(record['accountNo.'])
+            else:
+                cls.storage().put_account(record)
+        except ConflictError:
+            print("sorry the account was changed by someone else, please try again")
+            with cls._lock:
+                cls._data = None
+            return False
+        return True
     
     @classmethod
-    def __update(cls):
-        with open(cls.database,'w') as fs:
-            fs.write(json.dumps(cls.data))
+    def __finduser(cls, accn, pin):
+        acct = cls.load().get(accn)
+        if acct is None:
+            return None
+        ok, upgraded = check_pin(acct, pin)
+        if not ok:
+            return None
+        if upgraded:
+            # plaintext (or old sha256) pin replaced by a salted hash
+            cls.__update(acct)
+        return acct
     
     @classmethod
     def __accountgenerate(cls):
-        alpha = random.choices(string.ascii_letters,k=3)
-        num = random.choices(string.digits,k=3)
-        spchar  = random.choices("!@#$%^&*",k=1)
-        id  = alpha + num + spchar
-        random.shuffle(id)
-        return "".join(id)
+        # unique AC + 6 character numbers with a check character; accounts
+        # made earlier keep their old 7 character numbers
+        return allocator_for(cls.database).allocate()
         
     
             
@@ -73,16 +115,18 @@ class Bank:
             print("account has been created successfully")
             for i in info:
                 print(f"{i} : {info[i]}")
+            # only a salted hash of the pin is stored
+            info['pin_hash'] = make_pin_hash(str(info.pop('pin')))
             print("please not down your account number")
-            Bank.data.append(info)
-            Bank.__update()
+            Bank.load().add(info)
+            Bank.__update(info)
 
     def depositMoney(self):
         accn = input("tell your account number :-  ")
         pin = int(input("please tell your pin :- "))
 
-        userdata = [i for i in Bank.data if i['accountNo.'] == accn and i['pin'] == pin]
-        if userdata == False:
+        userdata = Bank.__finduser(accn, pin)
+        if userdata is None:
            print("sorry no data found")
         else:
            amount  = int(input("how much want to deposit :- "))
@@ -92,48 +136,52 @@ class Bank:
             
            else:
             #    print(userdata)
-               userdata[0]['balance']+=amount
-               Bank.__update()
-               print(userdata[0]['balance'])
-               print("Amount deposited successfully")
+               userdata['balance']+=amount
+               if Bank.__update(userdata):
+                   print(userdata['balance'])
+                   print("Amount deposited successfully")
                
                
     def withdrawMoney(self):
         accn = input("tell your account number :-  ")
         pin = int(input("please tell your pin :- "))
 
-        userdata = [i for i in Bank.data if i['accountNo.'] == accn and i['pin'] == pin]
-        if userdata == False:
+        userdata = Bank.__finduser(accn, pin)
+        if userdata is None:
            print("sorry no data found")
         else:
            amount  = int(input("how much want to withdraw :- "))
            
-           if userdata[0]['balance'] < amount:
+           if userdata['balance'] < amount:
                print("sorry you don't have that much money")
                
             
            else:
             #    print(userdata)
-               userdata[0]['balance']-=amount
-               Bank.__update()
-               print(userdata[0]['balance'])
-               print("Amount withdrew successfully")
+               userdata['balance']-=amount
+               if Bank.__update(userdata):
+                   print(userdata['balance'])
+                   print("Amount withdrew successfully")
     
     def showDetails(self):
         accn = input("tell your account number :-  ")
         pin = int(input("please tell your pin :- "))
-        userdata = [i for i in Bank.data if i['accountNo.'] == accn and i['pin'] == pin]
+        userdata = Bank.__finduser(accn, pin)
+        if userdata is None:
+            print("sorry no data found")
+            return
         print("Your information are:- ")
-        for i in userdata[0]:
-            print(f"{i} : {userdata[0][i]}")
+        for i in userdata:
+            if i not in ('pin_hash', 'version'):
+                print(f"{i} : {userdata[i]}")
         
         # print(userdata)
     
     def updateDetails(self):
         accn = input("tell your account number :-  ")
         pin = int(input("please tell your pin :- "))
-        userdata = [i for i in Bank.data if i['accountNo.'] == accn and i['pin'] == pin]
-        if userdata == False:
+        userdata = Bank.__finduser(accn, pin)
+        if userdata is None:
             print("no such user found")
         else:
             print("you cannot change the age,account number , balance")
@@ -147,35 +195,35 @@ class Bank:
             }
             
             if newdata["name"] == "":
-                newdata["name"] = userdata[0]["name"]
+                newdata["name"] = userdata["name"]
             if newdata["email"] == "":
-                newdata["email"] = userdata[0]["email"]
+                newdata["email"] = userdata["email"]
             if newdata["pin"] == "":
-                newdata["pin"] = userdata[0]["pin"]
-            
-            newdata['age'] = userdata[0]['age']
-            newdata['accountNo.'] = userdata[0]['accountNo.']
-            newdata['balance'] = userdata[0]['balance']
+                newdata["pin_hash"] = userdata["pin_hash"]
+            else:
+                newdata["pin_hash"] = make_pin_hash(str(int(newdata["pin"])))
+            del newdata["pin"]
             
-            if type(newdata['pin']) == str:
-                newdata['pin'] = int(newdata['pin'])
+            newdata['age'] = userdata['age']
+            newdata['accountNo.'] = userdata['accountNo.']
+            newdata['balance'] = userdata['balance']
             
             
             for i in newdata:
-                if newdata[i] == userdata[0][i]:
+                if newdata[i] == userdata[i]:
                     continue
                 else:
-                    userdata[0][i] = newdata[i]
+                    userdata[i] = newdata[i]
             
-            Bank.__update()
-            print("details update successfully")
+            if Bank.__update(userdata):
+                print("details update successfully")
             
     def deleteSelf(self):
         accn = input("tell your account number :-  ")
         pin = int(input("please tell your pin :- "))
-        userdata = [i for i in Bank.data if i['accountNo.'] == accn and i['pin'] == pin]
+        userdata = Bank.__finduser(accn, pin)
         
-        if userdata == False:
+        if userdata is None:
             print("no such data exist")
         else:
             check = input("press y if you want to delete the account or press n")
@@ -183,33 +231,43 @@ class Bank:
             if check == 'n' or check == "N":
                 print("bypassed")
             else:
-                index = Bank.data.index(userdata[0])
-                Bank.data.pop(index)
-                print("account deleted successfully")
-                Bank.__update()
+                if Bank.__update(userdata, deleted=True):
+                    Bank.load().remove(userdata['accountNo.'])
+                    print("account deleted successfully")
         
               
            
-user = Bank()
-print("press 1 forcreating an account")
-print("press 2 Deposiiting the money in the bank")
-print("press 3 for withdrawing the money")
-print("press 4 for details")
-print("press 5 for updateing the details")
-print("press 6 for deleting your account")
-
-
-check = int(input("tell your response :- "))
-
-if check == 1:
-    user.Createaccount()
-if check == 2:
-    user.depositMoney()
-if check == 3:
-    user.withdrawMoney()
-if check == 4:
-    user.showDetails()
-if check == 5:
-    user.updateDetails()
-if check == 6:
-    user.deleteSelf()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Bank account menu.")
+    parser.add_argument("--data", help="data file (default: $BANK_DATA or data.json next to this script)")
+    args = parser.parse_args()
+    if args.data:
+        Bank.database = args.data
+    Bank.preload()
+
+    user = Bank()
+    print("press 1 forcreating an account")
+    print("press 2 Deposiiting the money in the bank")
+    print("press 3 for withdrawing the money")
+    print("press 4 for details")
+    print("press 5 for updateing the details")
+    print("press 6 for deleting your account")
+
+    check = int(input("tell your response :- "))
+
+    if check == 1:
+        user.Createaccount()
+    if check == 2:
+        user.depositMoney()
+    if check == 3:
+        user.withdrawMoney()
+    if check == 4:
+        user.showDetails()
+    if check == 5:
+        user.updateDetails()
+    if check == 6:
+        user.deleteSelf()
+
+
+if __name__ == "__main__":
+    main()
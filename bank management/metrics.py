@@ -0,0 +1,209 @@
+"""
+Call counts and latency histograms for the bank operations.
+
+Functions are instrumented with the @timed(name) decorator, or a block of
+code with ``with timer(name):``. Every call adds its duration to a
+histogram with fixed buckets (Prometheus style: each bucket counts the calls
+taking at most its upper bound), kept in memory for the life of the process.
+The Streamlit app shows them on its "Admin: Metrics" page and bank_server.py
+at GET /metrics; prometheus_text() renders them in the Prometheus text
+format and write_prometheus() saves that to a file for a node exporter's
+textfile collector or for reading by hand (export_every() keeps it fresh).
+
+BANK_METRICS=0 turns recording off. A disabled timer costs one flag check
+per call; nothing is timed or stored.
+"""
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+# upper bounds in seconds; calls slower than the last go in the +Inf bucket
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC = "bank_operation_seconds"
+
+_enabled = os.environ.get("BANK_METRICS", "1") != "0"
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("name", "counts", "count", "sum", "lock")
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """Estimated ``q`` quantile in seconds, interpolated within its bucket."""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]
+                low = BUCKETS[i - 1] if i else 0.0
+                return low + (BUCKETS[i] - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(on):
+    global _enabled
+    _enabled = bool(on)
+
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault(name, Histogram(name))
+    return h
+
+
+def timed(name):
+    """Decorator recording the duration of every call under ``name``."""
+    def decorate(func):
+        h = histogram(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                h.observe(time.perf_counter() - start)
+
+        return wrapper
+    return decorate
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, h):
+        self.histogram = h
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timer(name):
+    """Context manager recording the duration of its block under ``name``."""
+    if not _enabled:
+        return _NO_TIMER
+    return _Timer(histogram(name))
+
+
+def _sorted():
+    with _histograms_lock:
+        return [_histograms[name] for name in sorted(_histograms)]
+
+
+def snapshot():
+    """One dict per instrumented name that has been called, by name."""
+    rows = []
+    for h in _sorted():
+        with h.lock:
+            count, total, counts = h.count, h.sum, list(h.counts)
+        if count:
+            rows.append({"name": h.name, "calls": count, "total_s": total, "mean_ms": total / count * 1000,
+                         "p50_ms": h.quantile(0.5) * 1000, "p95_ms": h.quantile(0.95) * 1000,
+                         "p99_ms": h.quantile(0.99) * 1000, "buckets": counts})
+    return rows
+
+
+def reset():
+    for h in list(_histograms.values()):
+        with h.lock:
+            h.counts = [0] * (len(BUCKETS) + 1)
+            h.count = 0
+            h.sum = 0.0
+
+
+def prometheus_text():
+    lines = [f"# HELP {METRIC} Duration of bank operations in seconds.",
+             f"# TYPE {METRIC} histogram"]
+    for h in _sorted():
+        with h.lock:
+            count, total, counts = h.count, h.sum, list(h.counts)
+        label = h.name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += n
+            lines.append(f'{METRIC}_bucket{{operation="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'{METRIC}_sum{{operation="{label}"}} {total!r}')
+        lines.append(f'{METRIC}_count{{operation="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Write prometheus_text() to ``path``, replacing it in one step."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(prometheus_text(), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+_exports = {}
+
+
+def export_every(path, seconds=15.0):
+    """Keep rewriting ``path`` with write_prometheus() every ``seconds`` (once per path)."""
+    path = Path(path).resolve()
+    with _histograms_lock:
+        if path in _exports:
+            return
+        _exports[path] = thread = threading.Thread(target=_export_loop, args=(path, seconds), daemon=True)
+    thread.start()
+
+
+def _export_loop(path, seconds):
+    while True:
+        time.sleep(seconds)
+        try:
+            write_prometheus(path)
+        except OSError:
+            pass  # try again next time
@@ -0,0 +1,252 @@
+"""
+Migrate CLI (main.py) data files to the Streamlit schema.
+
+The CLI keeps accounts under "accountNo." with a plaintext integer "pin" and
+no transaction history; the Streamlit app expects "accountNo", a salted
+"pin_hash" and a "transactions" list. This converts one or more CLI files
+(one per branch, say) into a Streamlit data file through the storage
+backend:
+
+- each file is parsed as a stream, one account at a time, so memory use
+  does not grow with the size of the file
+- plaintext PINs are hashed with scrypt (banking.make_pin_hash); accounts
+  already holding a pin_hash keep it
+- the app only accepts numbers from account_numbers.py, so CLI numbers of
+  another form, and numbers that are already taken, are replaced by fresh
+  ones from the allocator; every migrated account keeps its CLI number in
+  "legacyAccountNo"
+- a record whose CLI number was migrated before for the same person (same
+  name, age and email), from another branch file or by an earlier run, is a
+  duplicate and is skipped
+- accounts are committed in chunks with put_accounts()
+
+Hashing is by far the slowest step (scrypt is slow on purpose), so with
+--jobs N it runs in N worker processes while the main process reads the
+files, drops duplicates and commits, in order. Apart from the CLI numbers
+kept for spotting duplicates, memory use does not depend on the input size.
+Counts are printed per file, and --map writes the old and new number of
+every renumbered account.
+
+How to run:
+    python migrate_legacy.py data.json
+    python migrate_legacy.py branch_*.json --out bank_data.json --jobs 8 --map renumbered.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from account_numbers import allocator_for, well_formed
+from banking import make_pin_hash
+from storage import open_backend
+
+CHUNK = 256
+READ_SIZE = 1 << 16
+COUNTS = ["read", "migrated", "renumbered", "duplicates", "invalid"]
+# fields that tell whether two records with the same CLI number are the same
+# account (the balance may have moved on since an earlier migration)
+SAME = ("name", "age", "email")
+
+_SPACE = re.compile(r"\s*")
+
+
+def iter_array(fs, read_size=READ_SIZE):
+    """Yield the items of the JSON array in text file ``fs`` one at a time."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    expect = "["
+    while True:
+        pos = _SPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise ValueError("unexpected end of file")
+            more = fs.read(read_size)
+            buf, pos, eof = buf[pos:] + more, 0, not more
+            continue
+        char = buf[pos]
+        if expect == "[":
+            if char != "[":
+                raise ValueError("expected a JSON list of accounts")
+            pos += 1
+            expect = "first"
+        elif char == "]" and expect in ("first", ","):
+            return
+        elif expect == ",":
+            if char != ",":
+                raise ValueError(f"expected ',' or ']', got {char!r}")
+            pos += 1
+            expect = "item"
+        else:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = len(buf)
+            # an item running up to the end of the buffer may be cut short
+            if end == len(buf) and not eof:
+                more = fs.read(read_size)
+                buf, pos, eof = buf[pos:] + more, 0, not more
+                continue
+            yield item
+            pos = end
+            expect = ","
+
+
+def legacy_pin(pin):
+    # the CLI read the PIN with int(), which drops leading zeros
+    return f"{pin:04d}" if isinstance(pin, int) else str(pin)
+
+
+def usable(record):
+    return (isinstance(record, dict) and "accountNo." in record
+            and ("pin_hash" in record or "pin" in record))
+
+
+def convert(record):
+    """The Streamlit-schema account for a (usable) CLI record."""
+    acct = {k: v for k, v in record.items() if k not in ("pin", "pin_hash", "accountNo.", "version")}
+    acct["pin_hash"] = record["pin_hash"] if "pin_hash" in record else make_pin_hash(legacy_pin(record["pin"]))
+    acct["accountNo"] = acct["legacyAccountNo"] = str(record["accountNo."])
+    acct.setdefault("balance", 0)
+    acct.setdefault("transactions", [])
+    return acct
+
+
+def convert_chunk(records):
+    return [convert(record) for record in records]
+
+
+def read_chunks(paths, size=CHUNK):
+    """Yield (file index, records) in order, ``size`` records at a time."""
+    for i, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as fs:
+            chunk = []
+            for record in iter_array(fs):
+                chunk.append(record)
+                if len(chunk) == size:
+                    yield i, chunk
+                    chunk = []
+            if chunk:
+                yield i, chunk
+
+
+def converted_chunks(paths, jobs, select):
+    """
+    (file index, accounts) per chunk, in file order. ``select(i, records)``
+    picks the records of a chunk worth converting; it is called in this
+    process, in order, before any hashing.
+    """
+    if jobs <= 1:
+        for i, records in read_chunks(paths):
+            yield i, convert_chunk(select(i, records))
+        return
+    with ProcessPoolExecutor(jobs) as pool:
+        # a few chunks per worker in flight keeps them busy without reading
+        # the whole input ahead
+        pending = deque()
+        for i, records in read_chunks(paths):
+            pending.append((i, pool.submit(convert_chunk, select(i, records))))
+            if len(pending) >= jobs * 2:
+                i, future = pending.popleft()
+                yield i, future.result()
+        while pending:
+            i, future = pending.popleft()
+            yield i, future.result()
+
+
+def identity(record):
+    return tuple(record.get(field) for field in SAME)
+
+
+def migrate(paths, backend, jobs=1, renumbered=None):
+    """
+    Migrate the CLI files in ``paths`` into ``backend``. Returns one dict of
+    COUNTS per file. ``renumbered`` (a list) receives (file, old, new) for
+    every account given a new number.
+    """
+    allocator = allocator_for(backend.path)
+    counts = [dict.fromkeys(COUNTS, 0) for _ in paths]
+    # CLI number -> identities migrated under it, including by earlier runs
+    seen = {}
+    for acct in backend.load():
+        if "legacyAccountNo" in acct:
+            seen.setdefault(acct["legacyAccountNo"], set()).add(identity(acct))
+
+    def select(i, records):
+        count = counts[i]
+        count["read"] += len(records)
+        todo = []
+        for record in records:
+            if not usable(record):
+                count["invalid"] += 1
+                continue
+            idents = seen.setdefault(str(record["accountNo."]), set())
+            if identity(record) in idents:
+                count["duplicates"] += 1
+                continue
+            idents.add(identity(record))
+            todo.append(record)
+        return todo
+
+    def taken(account_no, batch):
+        return account_no in batch or backend.get_account(account_no) is not None
+
+    for i, accounts in converted_chunks(paths, jobs, select):
+        count = counts[i]
+        batch = {}
+        for acct in accounts:
+            old = acct["accountNo"]
+            if not well_formed(old) or taken(old, batch):
+                # keep looking in case a new number clashes with an older
+                # random one (see operations.create_account)
+                acct["accountNo"] = allocator.allocate()
+                while taken(acct["accountNo"], batch):
+                    acct["accountNo"] = allocator.allocate()
+                count["renumbered"] += 1
+                if renumbered is not None:
+                    renumbered.append((str(paths[i]), old, acct["accountNo"]))
+            batch[acct["accountNo"]] = acct
+            count["migrated"] += 1
+        if batch:
+            backend.put_accounts([(acct, []) for acct in batch.values()])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CLI data files to the Streamlit schema.")
+    parser.add_argument("files", nargs="+", help="CLI data files (JSON lists with accountNo. keys)")
+    parser.add_argument("--out", default="bank_data.json", help="Streamlit data file to add the accounts to")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="processes hashing PINs (default: one per CPU)")
+    parser.add_argument("--map", help="write file,old,new rows for renumbered accounts to this CSV file")
+    args = parser.parse_args()
+
+    backend = open_backend(args.out, key="accountNo", kind=args.backend)
+    renumbered = []
+    start = time.perf_counter()
+    counts = migrate(args.files, backend, args.jobs, renumbered)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'file':<30} " + " ".join(f"{c:>10}" for c in COUNTS))
+    for path, count in zip(args.files, counts):
+        print(f"{path:<30} " + " ".join(f"{count[c]:>10,}" for c in COUNTS))
+    total = {c: sum(count[c] for count in counts) for c in COUNTS}
+    print(f"{'total':<30} " + " ".join(f"{total[c]:>10,}" for c in COUNTS))
+    print(f"migrated into {args.out} in {elapsed:.2f}s")
+    if args.map:
+        with open(args.map, "w", encoding="utf-8", newline="") as fs:
+            writer = csv.writer(fs)
+            writer.writerow(["file", "old", "new"])
+            writer.writerows(renumbered)
+        print(f"{len(renumbered)} renumbered accounts written to {args.map}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Month-end batch: interest and maintenance fees for every account.
+
+Going through deposit() and withdraw() would be a find, check and commit per
+account. Instead the balances are loaded once (from load(), which does not
+read the histories on the segmented, mapped and SQLite backends) into a NumPy
+array of whole minor units (cents), the rules are applied to the whole array at once, and
+the results are written back in one put_accounts() commit: a single write
+of the data file (JSON), a single database transaction (SQLite).
+
+Rules (see RULES; --rules reads them from a JSON file):
+- interest is tiered: each slice of the balance earns the annual rate of its
+  tier, one twelfth per month, rounded half up to a whole cent; negative
+  balances earn nothing
+- a flat monthly fee is charged on balances below ``fee_waived_from``, but
+  never more than the account holds, so no balance goes negative
+
+Each account gets one transaction with the net of the two: "interest" when
+it gains, "fee" when it pays (nothing when they cancel out), and is marked
+with the month ("accrued"), so the month is never applied twice, even when
+the job is run again. The transactions count towards the account's limits
+(limits.record) but are not checked against them. The commit checks every
+account's version; if a session changed one in the meantime, the whole batch
+is worked out again.
+
+--dry-run only prints the totals.
+
+How to run:
+    python month_end.py --dry-run
+    python month_end.py --month 2025-01 --rules rules.json --backend sqlite
+"""
+
+import argparse
+import json
+import time
+from datetime import date, datetime
+
+import limits
+from banking import MINOR_UNITS, from_minor, to_minor
+from operations import COMMIT_RETRIES
+from storage import ConflictError, open_backend
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RULES = {
+    # [from balance, annual rate]: the rate applies to the part of the
+    # balance between its tier and the next
+    "interest_tiers": [[0, 0.005], [5000, 0.015], [50000, 0.025]],
+    "monthly_fee": 2.5,
+    "fee_waived_from": 1000,
+}
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("The month-end batch needs NumPy (pip install numpy).")
+
+
+def last_month(today):
+    """"YYYY-MM" of the month before ``today``'s."""
+    if today.month == 1:
+        return f"{today.year - 1}-12"
+    return f"{today.year}-{today.month - 1:02d}"
+
+
+def charges(balances, rules):
+    """
+    (interest, fees) in minor units for an int64 array of balances in minor
+    units.
+    """
+    require_numpy()
+    tiers = sorted(rules["interest_tiers"])
+    interest = np.zeros(len(balances))
+    for i, (start, rate) in enumerate(tiers):
+        low = to_minor(start)
+        width = to_minor(tiers[i + 1][0]) - low if i + 1 < len(tiers) else None
+        interest += np.clip(balances - low, 0, width) * (rate / 12)
+    interest = np.floor(interest + 0.5).astype(np.int64)
+    fees = np.where(balances < to_minor(rules["fee_waived_from"]), to_minor(rules["monthly_fee"]), 0)
+    fees = np.minimum(fees, np.maximum(balances + interest, 0))
+    return interest, fees
+
+
+class Plan:
+    """What the month-end batch would do to the accounts not accrued for ``month`` yet."""
+
+    def __init__(self, backend, month, rules):
+        require_numpy()
+        self.month = month
+        # balances and profiles only: nothing here needs the histories, and
+        # put_accounts() appends the new transactions to them
+        accounts = list(backend.load())
+        self.todo = [acct for acct in accounts if acct.get("accrued") != month]
+        self.done = len(accounts) - len(self.todo)
+        balances = np.fromiter((acct["balance"] for acct in self.todo), dtype=np.float64, count=len(self.todo))
+        # balances are whole cents already (see banking.money), so this is exact
+        self.balances = np.rint(balances * MINOR_UNITS).astype(np.int64)
+        self.interest, self.fees = charges(self.balances, rules)
+
+    def totals(self):
+        net = self.interest - self.fees
+        return {"accounts": len(self.todo), "already done": self.done,
+                "credited": int((net > 0).sum()), "charged": int((net < 0).sum()),
+                "interest": from_minor(int(self.interest.sum())), "fees": from_minor(int(self.fees.sum())),
+                "net": from_minor(int(net.sum()))}
+
+    def apply(self, backend):
+        """Commit the interest and fees in one put_accounts() call."""
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        net = (self.interest - self.fees).tolist()
+        balances = (self.balances + self.interest - self.fees).tolist()
+        batch = []
+        for record, change, balance in zip(self.todo, net, balances):
+            acct = {k: record[k] for k in record.keys() if k != "transactions"}
+            acct["balance"] = from_minor(balance)
+            acct["accrued"] = self.month
+            if change > 0:
+                txs = [{"type": "interest", "amount": from_minor(change), "timestamp": timestamp}]
+            elif change < 0:
+                txs = [{"type": "fee", "amount": from_minor(-change), "timestamp": timestamp}]
+            else:
+                txs = []
+            for tx in txs:
+                limits.record(acct, tx)
+            batch.append((acct, txs))
+        if batch:
+            backend.put_accounts(batch)
+
+
+def run(backend, month, rules=RULES, dry_run=False):
+    """Apply (or with ``dry_run`` only work out) ``month``'s interest and fees; returns the totals."""
+    for _ in range(COMMIT_RETRIES):
+        batch = Plan(backend, month, rules)
+        if not dry_run:
+            try:
+                batch.apply(backend)
+            except ConflictError:
+                continue
+        return batch.totals()
+    raise ConflictError("Accounts kept changing during the month-end batch, please try again.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply month-end interest and fees to every account.")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--month", default=last_month(date.today()),
+                        help="month to accrue, YYYY-MM (default: last month)")
+    parser.add_argument("--rules", help="JSON file with interest_tiers, monthly_fee and fee_waived_from")
+    parser.add_argument("--dry-run", action="store_true", help="only print the totals")
+    args = parser.parse_args()
+
+    rules = dict(RULES)
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as fs:
+            rules.update(json.load(fs))
+    backend = open_backend(args.data, key="accountNo", kind=args.backend)
+    start = time.perf_counter()
+    try:
+        result = run(backend, args.month, rules, args.dry_run)
+    except (RuntimeError, ConflictError) as e:
+        raise SystemExit(str(e))
+    print(f"month {args.month}{' (dry run, nothing written)' if args.dry_run else ''}")
+    for name, value in result.items():
+        print(f"{name:>13}: {value:,.2f}" if isinstance(value, float) else f"{name:>13}: {value:,}")
+    print(f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
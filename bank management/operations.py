@@ -0,0 +1,192 @@
+"""
+Account operations shared by the Streamlit app and the HTTP server.
+
+Each operation takes the storage backend to work on (see storage.py) and
+returns (ok, result): the account dict on success, otherwise a message for
+the user. Storage errors other than a version conflict are not handled here;
+each front-end reports them its own way.
+
+Wherever an operation takes a ``pin`` it also accepts a session token from
+login(), which is much cheaper to check than the PIN itself. Deposits and
+withdrawals are also held to the rolling limits in limits.py.
+
+Every operation records its call count and latency (see metrics.py).
+"""
+
+import limits
+from account_numbers import allocator_for, is_valid, well_formed
+from banking import add_money, add_transaction, check_deposit, check_pin, check_withdraw, make_pin_hash, money
+from metrics import timed
+from sessions import SessionTable, is_token
+from storage import ConflictError
+
+# how often an operation is retried when another session changed the account
+COMMIT_RETRIES = 5
+BUSY = "The account was changed by another session, please try again."
+NOT_FOUND = "Account not found or incorrect PIN."
+
+# shared by every front-end in this process
+SESSIONS = SessionTable()
+
+
+@timed("commit")
+def commit(backend, acct, tx=None):
+    """Commit acct; False means another session changed it first."""
+    try:
+        backend.put_account(acct, tx)
+    except ConflictError:
+        return False
+    return True
+
+
+def not_found(account_no):
+    if not is_valid(account_no):
+        # numbers issued before the check character existed can still be
+        # real accounts, so this is only a hint
+        return "Account not found or incorrect PIN. Please check the account number for typos."
+    return NOT_FOUND
+
+
+@timed("find_user")
+def find_user(backend, account_no, pin=None):
+    if not well_formed(account_no):
+        return None
+    acct = backend.get_account(account_no)
+    if acct is None or pin is None:
+        return acct
+    if is_token(pin):
+        return acct if SESSIONS.check(pin, account_no) else None
+    ok, upgraded = check_pin(acct, pin)
+    if not ok:
+        return None
+    if upgraded:
+        # store the new PIN hash now; if someone else got in first the
+        # upgrade just happens on a later login
+        commit(backend, acct)
+    return acct
+
+
+@timed("login")
+def login(backend, account_no, pin):
+    """Check the PIN once and return (True, session token)."""
+    if is_token(pin) or find_user(backend, account_no, pin) is None:
+        return False, not_found(account_no)
+    return True, SESSIONS.issue(account_no)
+
+
+def logout(token):
+    SESSIONS.revoke(token)
+
+
+@timed("create_account")
+def create_account(backend, name, age, email, pin):
+    # basic checks
+    if age < 18:
+        return False, "You must be at least 18 years old to create an account."
+    if not (isinstance(pin, str) and pin.isdigit() and len(pin) == 4):
+        return False, "PIN must be a 4-digit number."
+    # optional: check email contains '@'
+    if "@" not in email or email.strip().startswith("@"):
+        return False, "Please enter a valid email address."
+
+    account_no = allocator_for(backend.path).allocate()
+    # allocated numbers never repeat, but one could still match an older,
+    # randomly generated account
+    while backend.get_account(account_no) is not None:
+        account_no = allocator_for(backend.path).allocate()
+
+    acct = {
+        "name": name.strip(),
+        "age": int(age),
+        "email": email.strip(),
+        "pin_hash": make_pin_hash(pin),
+        "accountNo": account_no,
+        "balance": 0,
+        "transactions": []
+    }
+    if not commit(backend, acct):
+        return False, BUSY
+    return True, acct
+
+
+# deposit, withdraw and update re-read the account and try again when another
+# session committed a change to it in the meantime (see storage.py)
+
+@timed("deposit")
+def deposit(backend, account_no, pin, amount):
+    try:
+        amount = money(amount)
+    except (ValueError, OverflowError) as e:
+        return False, str(e)
+    for _ in range(COMMIT_RETRIES):
+        acct = find_user(backend, account_no, pin)
+        if acct is None:
+            return False, not_found(account_no)
+        error = check_deposit(acct, amount) or limits.check(acct, "deposit", amount)
+        if error:
+            return False, error
+        acct["balance"] = add_money(acct["balance"], amount)
+        tx = add_transaction(acct, "deposit", amount)
+        limits.record(acct, tx)
+        if commit(backend, acct, tx):
+            return True, acct
+    return False, BUSY
+
+
+@timed("withdraw")
+def withdraw(backend, account_no, pin, amount):
+    try:
+        amount = money(amount)
+    except (ValueError, OverflowError) as e:
+        return False, str(e)
+    for _ in range(COMMIT_RETRIES):
+        acct = find_user(backend, account_no, pin)
+        if acct is None:
+            return False, not_found(account_no)
+        error = check_withdraw(acct, amount) or limits.check(acct, "withdraw", amount)
+        if error:
+            return False, error
+        acct["balance"] = add_money(acct["balance"], -amount)
+        tx = add_transaction(acct, "withdraw", amount)
+        limits.record(acct, tx)
+        if commit(backend, acct, tx):
+            return True, acct
+    return False, BUSY
+
+
+@timed("update_account")
+def update_account(backend, account_no, pin, new_name=None, new_email=None, new_pin=None):
+    if new_pin and not (new_pin.isdigit() and len(new_pin) == 4):
+        return False, "New PIN must be a 4-digit number."
+    for _ in range(COMMIT_RETRIES):
+        acct = find_user(backend, account_no, pin)
+        if acct is None:
+            return False, not_found(account_no)
+        changed = False
+        if new_name and new_name.strip() != acct["name"]:
+            acct["name"] = new_name.strip()
+            changed = True
+        if new_email and new_email.strip() != acct["email"]:
+            acct["email"] = new_email.strip()
+            changed = True
+        if new_pin:
+            acct["pin_hash"] = make_pin_hash(new_pin)
+            changed = True
+        if not changed:
+            return False, "No changes made."
+        if commit(backend, acct):
+            if new_pin:
+                # sessions opened with the old PIN end with it
+                SESSIONS.revoke_account(account_no)
+            return True, acct
+    return False, BUSY
+
+
+@timed("delete_account")
+def delete_account(backend, account_no, pin):
+    acct = find_user(backend, account_no, pin)
+    if acct is None:
+        return False, not_found(account_no)
+    backend.delete_account(account_no)
+    SESSIONS.revoke_account(account_no)
+    return True, None
@@ -0,0 +1,269 @@
+"""
+Compact record types for accounts and transactions.
+
+An account as a dict costs a hash table plus one string key per field, and
+every transaction is another dict holding an ISO timestamp string. Account
+uses __slots__ instead, and an account's history is a TransactionLog: three
+parallel arrays (type code, amount, epoch microseconds) rather than a list of
+dicts.
+
+Both convert losslessly to and from the JSON schema of either app
+(from_dict / to_dict). Account also answers the dict operations the apps use
+(acct["balance"], acct.get(...), acct.items(), ...), so code written against
+plain dicts keeps working when the store holds Account objects.
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# type codes are only used in memory; files keep the type names
+TX_TYPES = ["deposit", "withdraw"]
+_TX_CODES = {ttype: code for code, ttype in enumerate(TX_TYPES)}
+# set on the stored type code when the amount was an int rather than a float
+_INT_AMOUNT = 0x80
+
+
+def type_code(ttype):
+    code = _TX_CODES.get(ttype)
+    if code is None:
+        code = len(TX_TYPES)
+        if code >= _INT_AMOUNT:
+            raise ValueError(f"Too many transaction types to add {ttype!r}")
+        TX_TYPES.append(ttype)
+        _TX_CODES[ttype] = code
+    return code
+
+
+def iso_to_micros(timestamp):
+    """Parse the apps' "2025-09-22T18:24:26.423831Z" timestamps (UTC)."""
+    return (datetime.fromisoformat(timestamp.rstrip("Z")) - EPOCH) // ONE_MICROSECOND
+
+
+def micros_to_iso(micros):
+    return (EPOCH + timedelta(microseconds=micros)).isoformat() + "Z"
+
+
+class Transaction:
+    __slots__ = ("type", "amount", "timestamp")
+
+    def __init__(self, type, amount, timestamp):
+        self.type = type
+        self.amount = amount
+        self.timestamp = timestamp  # epoch microseconds
+
+    @classmethod
+    def from_dict(cls, tx):
+        return cls(tx["type"], tx["amount"], iso_to_micros(tx["timestamp"]))
+
+    def to_dict(self):
+        return {"type": self.type, "amount": self.amount, "timestamp": micros_to_iso(self.timestamp)}
+
+
+class TransactionLog:
+    """An account's transactions stored column-wise in arrays."""
+
+    __slots__ = ("codes", "amounts", "times", "odd")
+
+    def __init__(self):
+        self.codes = array("B")
+        self.amounts = array("d")
+        self.times = array("q")
+        # timestamps that do not round-trip through micros_to_iso, by position
+        self.odd = None
+
+    @classmethod
+    def from_list(cls, txs):
+        log = cls()
+        for tx in txs:
+            log.append(tx)
+        return log
+
+    def to_list(self):
+        return [self._dict_at(i) for i in range(len(self.codes))]
+
+    def append(self, tx):
+        if isinstance(tx, Transaction):
+            tx = tx.to_dict()
+        amount = tx["amount"]
+        code = type_code(tx["type"])
+        if isinstance(amount, int):
+            code |= _INT_AMOUNT
+        micros = iso_to_micros(tx["timestamp"])
+        if micros_to_iso(micros) != tx["timestamp"]:
+            if self.odd is None:
+                self.odd = {}
+            self.odd[len(self.codes)] = tx["timestamp"]
+        self.codes.append(code)
+        self.amounts.append(amount)
+        self.times.append(micros)
+
+    def _dict_at(self, i):
+        code = self.codes[i]
+        amount = self.amounts[i]
+        if code & _INT_AMOUNT:
+            amount = int(amount)
+        if self.odd is not None and i in self.odd:
+            timestamp = self.odd[i]
+        else:
+            timestamp = micros_to_iso(self.times[i])
+        return {"type": TX_TYPES[code & ~_INT_AMOUNT], "amount": amount, "timestamp": timestamp}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        for i in range(len(self.codes)):
+            yield self._dict_at(i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._dict_at(j) for j in range(*i.indices(len(self.codes)))]
+        if i < 0:
+            i += len(self.codes)
+        if not 0 <= i < len(self.codes):
+            raise IndexError("transaction index out of range")
+        return self._dict_at(i)
+
+
+def time_range(txs, start, end=None):
+    """
+    Index range (lo, hi) of the transactions with start <= time < end, in
+    epoch microseconds, of a history in time order: a TransactionLog or a
+    list of transaction dicts. Binary search, so only O(log n) timestamps are
+    looked at.
+    """
+    if isinstance(txs, TransactionLog):
+        times, key = txs.times, None
+    else:
+        times, key = txs, _tx_micros
+    lo = bisect_left(times, start, key=key)
+    hi = len(txs) if end is None else bisect_left(times, end, lo, key=key)
+    return lo, hi
+
+
+def _tx_micros(tx):
+    return iso_to_micros(tx["timestamp"])
+
+
+# JSON key -> slot, in the order each app writes its fields
+_KEYS = {
+    "name": "name",
+    "age": "age",
+    "email": "email",
+    "pin_hash": "pin_hash",
+    "accountNo": "account_no",
+    "balance": "balance",
+    "transactions": "transactions",
+}
+_LEGACY_KEYS = {
+    "name": "name",
+    "age": "age",
+    "email": "email",
+    "pin": "pin",
+    "pin_hash": "pin_hash",
+    "accountNo.": "account_no",
+    "balance": "balance",
+}
+
+
+class Account:
+    """
+    One account. Fields missing from the source dict are left unset, so
+    to_dict() writes back exactly the keys that were read. Keys that are not
+    part of either schema are kept in ``extra``.
+    """
+
+    __slots__ = ("name", "age", "email", "pin_hash", "pin", "account_no",
+                 "balance", "transactions", "legacy", "extra")
+
+    def __init__(self, legacy=False):
+        self.legacy = legacy
+        self.extra = None
+
+    def _keys(self):
+        return _LEGACY_KEYS if self.legacy else _KEYS
+
+    @classmethod
+    def from_dict(cls, record):
+        acct = cls(legacy="accountNo." in record)
+        for key, value in record.items():
+            acct[key] = value
+        return acct
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getitem__(self, key):
+        slot = self._keys().get(key)
+        if slot is not None:
+            try:
+                return getattr(self, slot)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = self._keys().get(key)
+        if slot == "transactions" and not isinstance(value, TransactionLog):
+            value = TransactionLog.from_list(value)
+        if slot is not None:
+            setattr(self, slot, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        slot = self._keys().get(key)
+        if slot is not None:
+            if hasattr(self, slot):
+                delattr(self, slot)
+        elif self.extra is not None:
+            self.extra.pop(key, None)
+        return value
+
+    def keys(self):
+        keys = [key for key, slot in self._keys().items() if hasattr(self, slot)]
+        if self.extra is not None:
+            keys.extend(self.extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        for key, slot in self._keys().items():
+            try:
+                value = getattr(self, slot)
+            except AttributeError:
+                continue
+            if slot == "transactions":
+                value = value.to_list()
+            yield key, value
+        if self.extra is not None:
+            yield from self.extra.items()
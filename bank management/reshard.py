@@ -0,0 +1,55 @@
+"""
+Change the number of shards of a sharded data directory.
+
+Reads every account from the current shards (or from the plain JSON data
+file if it was never sharded), writes them into a new directory with the
+requested number of shards and swaps it in. Stop the apps using the data
+first: a write made while resharding would be lost.
+
+How to run:
+    python reshard.py --shards 256
+    python reshard.py --data data.json --key accountNo. --shards 4
+"""
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+from storage import ShardedBackend
+
+
+def reshard(path, key, count, indent=None):
+    path = Path(path).resolve()
+    source = ShardedBackend(path, key, indent)
+    old_count = source.count
+
+    # build the new layout under a temporary name next to the real one
+    staging = ShardedBackend(path.with_name(path.stem + ".resharding" + path.suffix), key, indent,
+                             shards=count)
+    staging.save(source.load())
+
+    old = source.directory.with_name(source.directory.name + ".old")
+    source.directory.rename(old)
+    staging.directory.rename(source.directory)
+    shutil.rmtree(old)
+    return old_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Change the number of account shards.")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file the shards belong to")
+    parser.add_argument("--key", default="accountNo",
+                        help='account number field ("accountNo." for the CLI data)')
+    parser.add_argument("--shards", type=int, required=True, help="new number of shards")
+    parser.add_argument("--indent", type=int, help="indent the shard files (default: compact)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    old_count = reshard(args.data, args.key, args.shards, args.indent)
+    print(f"resharded {args.data} from {old_count} to {args.shards} shards "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Per-account transaction segment files.
+
+Each account's history lives in its own file, ``<dir>/<account_no>.jsonl``,
+one transaction per line in time order, so account-level operations never
+parse anyone's history. A new transaction is one appended line, the last N
+transactions are read by seeking backwards from the end of the file, and a
+time range is found by binary search over the file.
+
+Appends and rewrites are fsync'ed (see durable.py) before they return, so a
+committed transaction survives a crash of the machine; with ``sync=False``
+that is left to the operating system.
+"""
+
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+import serializer
+from durable import append_durably, write_durably
+from records import iso_to_micros
+
+TAIL_BLOCK = 4096
+
+
+class SegmentStore:
+    def __init__(self, directory, sync=True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sync = sync
+
+    def path(self, account_no):
+        # the CLI account numbers contain characters like * and % that are
+        # not safe in file names everywhere
+        return self.directory / (quote(account_no, safe="") + ".jsonl")
+
+    def append(self, account_no, tx):
+        self.extend(account_no, [tx])
+
+    def extend(self, account_no, txs):
+        if not txs:
+            return
+        data = b"".join(serializer.dumps_line(tx) for tx in txs)
+        if self.sync:
+            append_durably(self.path(account_no), data)
+        else:
+            with open(self.path(account_no), "ab") as fs:
+                fs.write(data)
+
+    def write(self, account_no, txs):
+        """Replace an account's whole history."""
+        data = b"".join(serializer.dumps_line(tx) for tx in txs)
+        path = self.path(account_no)
+        if self.sync:
+            write_durably(path, data)
+        else:
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+    def read(self, account_no):
+        """Yield every transaction of an account, oldest first."""
+        try:
+            fs = open(self.path(account_no), "rb")
+        except FileNotFoundError:
+            return
+        with fs:
+            for line in fs:
+                if line.strip():
+                    yield serializer.loads(line)
+
+    def between(self, account_no, start, end=None):
+        """
+        Yield the transactions with start <= time < end (epoch microseconds),
+        oldest first. The first one is found by binary search over byte
+        offsets in the file, so only O(log n) lines are parsed before it.
+        """
+        try:
+            fs = open(self.path(account_no), "rb")
+        except FileNotFoundError:
+            return
+        with fs:
+            lo, hi = 0, fs.seek(0, os.SEEK_END)
+            # smallest offset whose next whole line is at or after start
+            while lo < hi:
+                mid = (lo + hi) // 2
+                line = _line_from(fs, mid)[1]
+                if not line.strip() or _micros(line) >= start:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            fs.seek(_line_from(fs, lo)[0])
+            for line in fs:
+                if not line.strip():
+                    continue
+                if end is not None and _micros(line) >= end:
+                    break
+                yield serializer.loads(line)
+
+    def tail(self, account_no, n):
+        """Return the last ``n`` transactions, oldest first."""
+        if n <= 0:
+            return []
+        try:
+            fs = open(self.path(account_no), "rb")
+        except FileNotFoundError:
+            return []
+        with fs:
+            pos = fs.seek(0, os.SEEK_END)
+            buf = b""
+            # one extra newline guarantees the first kept line is complete
+            while pos > 0 and buf.count(b"\n") <= n:
+                step = min(TAIL_BLOCK, pos)
+                pos -= step
+                fs.seek(pos)
+                buf = fs.read(step) + buf
+        lines = [line for line in buf.split(b"\n") if line.strip()]
+        return [serializer.loads(line) for line in lines[-n:]]
+
+    def delete(self, account_no):
+        try:
+            self.path(account_no).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _line_from(fs, pos):
+    """(offset, line) of the first line starting at or after byte ``pos``."""
+    if pos == 0:
+        fs.seek(0)
+    else:
+        # the byte before pos tells whether pos starts a line
+        fs.seek(pos - 1)
+        fs.readline()
+    offset = fs.tell()
+    return offset, fs.readline()
+
+
+def _micros(line):
+    return iso_to_micros(serializer.loads(line)["timestamp"])
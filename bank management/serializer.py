@@ -0,0 +1,52 @@
+"""
+JSON encoding for the bank data files.
+
+Every backend reads and writes JSON through dumps()/loads() here instead of
+calling the json module directly. When orjson is installed (pip install
+orjson) it is used; it is several times faster than the stdlib in both
+directions. Otherwise the stdlib json module is used.
+
+Output is compact (no indentation, no spaces after separators) unless an
+indent is asked for: the data files are rewritten on every change, and
+indenting makes that slower and the files bigger. Use export_pretty.py for
+a readable copy. Both encoders produce valid JSON the other can read, so
+installing or removing orjson does not affect existing files.
+"""
+
+import json
+
+from metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+NAME = "orjson" if orjson is not None else "json"
+
+
+@timed("serializer.dumps")
+def dumps(obj, indent=None) -> bytes:
+    """Encode ``obj`` as UTF-8 JSON bytes."""
+    if orjson is not None and indent in (None, 2):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the stdlib can still write
+            pass
+    if indent:
+        return json.dumps(obj, indent=indent).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_line(obj) -> bytes:
+    """One JSON Lines record, newline included."""
+    return dumps(obj) + b"\n"
+
+
+@timed("serializer.loads")
+def loads(data):
+    """Decode JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,89 @@
+"""
+Login sessions.
+
+Checking a PIN is slow on purpose (scrypt, see banking.py), so a client logs
+in once and then sends a session token instead of the PIN. A token is
+"<id>.<signature>": a random id from ``secrets`` and an HMAC over the id, the
+account number and the expiry time. The table maps the id to its account and
+expiry, so checking a token is one dict lookup and one HMAC.
+
+The table is bounded: tokens expire after ``ttl`` seconds and when it is full
+the oldest session is dropped. It lives in memory, so a restart logs every
+session out.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionTable:
+    def __init__(self, ttl=15 * 60, max_sessions=10000, secret=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.secret = secret or secrets.token_bytes(32)
+        self.lock = threading.Lock()
+        # id -> (account number, expiry); insertion order is expiry order
+        # because every session gets the same ttl
+        self.sessions = OrderedDict()
+        self.by_account = {}
+
+    def _sign(self, session_id, account_no, expires):
+        message = f"{session_id}\0{account_no}\0{expires}".encode("utf-8")
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def _drop(self, session_id):
+        account_no, _ = self.sessions.pop(session_id)
+        ids = self.by_account[account_no]
+        ids.discard(session_id)
+        if not ids:
+            del self.by_account[account_no]
+
+    def _expire(self, now):
+        while self.sessions:
+            session_id, (_, expires) = next(iter(self.sessions.items()))
+            if expires > now and len(self.sessions) < self.max_sessions:
+                break
+            self._drop(session_id)
+
+    def issue(self, account_no):
+        """Start a session for ``account_no`` and return its token."""
+        now = time.time()
+        session_id = secrets.token_urlsafe(16)
+        expires = int(now + self.ttl)
+        with self.lock:
+            self._expire(now)
+            self.sessions[session_id] = (account_no, expires)
+            self.by_account.setdefault(account_no, set()).add(session_id)
+        return f"{session_id}.{self._sign(session_id, account_no, expires)}"
+
+    def check(self, token, account_no):
+        """True if ``token`` is a live session of ``account_no``."""
+        session_id, _, signature = token.partition(".")
+        with self.lock:
+            entry = self.sessions.get(session_id)
+        if entry is None or entry[0] != account_no or entry[1] <= time.time():
+            return False
+        return hmac.compare_digest(signature, self._sign(session_id, *entry))
+
+    def revoke(self, token):
+        with self.lock:
+            session_id = token.partition(".")[0]
+            if session_id in self.sessions:
+                self._drop(session_id)
+
+    def revoke_account(self, account_no):
+        with self.lock:
+            for session_id in list(self.by_account.get(account_no, ())):
+                self._drop(session_id)
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+def is_token(credential):
+    # PINs are 4 digits; tokens always contain the "." separator
+    return isinstance(credential, str) and "." in credential
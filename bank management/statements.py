@@ -0,0 +1,130 @@
+"""
+Account statements for a date range.
+
+A statement lists an account's transactions between two dates with the
+opening balance, a running balance per row and the closing balance. The rows
+come from the backend's transactions_between(), which finds the start of the
+range by binary search, and are streamed one at a time, to the Streamlit app
+or to a CSV file, so a long statement is never held in memory as a whole.
+
+The balances are worked out backwards from the account's current balance
+(closing = balance minus everything after the range), so they are right even
+for accounts whose history does not start at zero. The sums are kept in
+whole minor units (cents, see banking.to_minor), so they come out exact.
+Transactions moved to the archive by archive.py are read from there when the
+range reaches back far enough.
+
+How to run:
+    python statements.py AC123456 --from 2025-01-01 --to 2025-01-31
+    python statements.py AC123456 --from 2025-01-01 --to 2025-01-31 --out statement.csv
+"""
+
+import argparse
+import csv
+import io
+import sys
+from datetime import date, timedelta
+
+import archive
+from banking import TX_SIGNS, from_minor, to_minor
+from records import iso_to_micros
+from storage import open_backend
+
+COLUMNS = ["timestamp", "type", "amount", "balance"]
+
+
+def day_start(day):
+    """Epoch microseconds at the start (UTC) of a date."""
+    return iso_to_micros(day.isoformat() + "T00:00:00")
+
+
+def signed(tx):
+    """The transaction's effect on the balance, in minor units."""
+    return TX_SIGNS.get(tx["type"], 1) * to_minor(tx["amount"])
+
+
+class Statement:
+    def __init__(self, backend, account_no, first_day, last_day):
+        """Statement of ``account_no`` from ``first_day`` to ``last_day``, inclusive."""
+        acct = backend.get_account(account_no)
+        if acct is None:
+            raise KeyError(account_no)
+        self.backend = backend
+        self.acct = acct
+        self.account_no = account_no
+        self.first_day = first_day
+        self.last_day = last_day
+        self.start = day_start(first_day)
+        self.end = day_start(last_day + timedelta(days=1))
+        checkpoint = acct.get("archived")
+        if checkpoint is not None and self.end < iso_to_micros(checkpoint["until"]):
+            # start from the balance at the checkpoint instead of adding up
+            # everything since
+            later = archive.transactions_between(backend, acct, self.end, iso_to_micros(checkpoint["until"]))
+            closing = to_minor(checkpoint["balance"]) - sum(signed(tx) for tx in later)
+        else:
+            later = archive.transactions_between(backend, acct, self.end)
+            closing = to_minor(acct["balance"]) - sum(signed(tx) for tx in later)
+        total = sum(signed(tx) for tx in archive.transactions_between(backend, acct, self.start, self.end))
+        # in minor units; opening, closing and total are the amounts
+        self.opening_minor = closing - total
+        self.closing = from_minor(closing)
+        self.total = from_minor(total)
+        self.opening = from_minor(self.opening_minor)
+
+    def rows(self):
+        """Yield one dict per transaction in the range, with the running balance."""
+        balance = self.opening_minor
+        for tx in archive.transactions_between(self.backend, self.acct, self.start, self.end):
+            balance += signed(tx)
+            yield {"timestamp": tx["timestamp"], "type": tx["type"], "amount": tx["amount"],
+                   "balance": from_minor(balance)}
+
+
+def write_csv(statement, fs):
+    writer = csv.writer(fs)
+    writer.writerow(["opening balance", "", "", statement.opening])
+    writer.writerow(COLUMNS)
+    count = 0
+    for row in statement.rows():
+        writer.writerow([row[c] for c in COLUMNS])
+        count += 1
+    writer.writerow(["closing balance", "", "", statement.closing])
+    return count
+
+
+def csv_bytes(statement):
+    """The statement as UTF-8 CSV, e.g. for a download button."""
+    buffer = io.BytesIO()
+    with io.TextIOWrapper(buffer, encoding="utf-8", newline="", write_through=True) as fs:
+        write_csv(statement, fs)
+        return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write an account statement for a date range as CSV.")
+    parser.add_argument("account_no")
+    parser.add_argument("--from", dest="first", type=date.fromisoformat, required=True,
+                        help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="last", type=date.fromisoformat, required=True,
+                        help="last day (included), YYYY-MM-DD")
+    parser.add_argument("--data", default="bank_data.json", help="bank data file")
+    parser.add_argument("--backend", help="storage backend (default: $BANK_BACKEND or json)")
+    parser.add_argument("--out", help="CSV file to write (default: standard output)")
+    args = parser.parse_args()
+
+    backend = open_backend(args.data, key="accountNo", kind=args.backend)
+    try:
+        statement = Statement(backend, args.account_no, args.first, args.last)
+    except KeyError:
+        raise SystemExit(f"Account {args.account_no} not found.")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8", newline="") as fs:
+            count = write_csv(statement, fs)
+        print(f"{count} transactions written to {args.out}")
+    else:
+        write_csv(statement, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
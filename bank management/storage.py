@@ -0,0 +1,968 @@
+"""
+Storage backends for the bank apps.
+
+Both front-ends talk to a backend instead of reading and writing one JSON blob
+directly. Every backend offers the same small interface:
+
+    load()                          all accounts as an AccountStore
+    save(store)                     replace everything with ``store``
+    get_account(account_no)         one account dict (or None)
+    put_account(acct, tx=None)      insert/update an account, plus one new transaction
+    put_accounts(batch)             the same for many (acct, [tx, ...]) pairs in one commit
+    append_transaction(account_no, tx)
+    delete_account(account_no)
+    iter_accounts()                 iterate over every account dict, with history
+    recent_transactions(account_no, n)   the last n transactions, oldest first
+    transactions_between(account_no, start, end=None)
+                                    transactions with start <= time < end (epoch
+                                    microseconds), oldest first, found by binary search
+    data_stamp()                    a value that changes whenever the data does
+                                    (None if the backend cannot tell)
+
+get_account() returns a private copy of the account without its history, so
+callers can change it freely. Transactions are only ever added through ``tx``
+(or ``txs`` in a batch) when the account is committed; a "transactions" list
+on the dict is only used to seed the history of a new account. Use
+recent_transactions() to show history.
+
+Every account carries a "version" number (missing means 0). A commit only
+succeeds if the stored account still has the version the caller read, and
+bumps it; otherwise it raises ConflictError and changes nothing, and the
+caller re-reads and retries. For the file backends the read-check-write of a
+commit runs under an advisory lock (fcntl, see CommitLock), which is not held
+while a request is being handled, so concurrent sessions only wait for each
+other's commits.
+
+Backends:
+    json       the original single JSON file (default)
+    journal    JSON snapshot plus an append-only change log (see journal.py);
+               single process only
+    segmented  JSON file of accounts, history in per-account segment files
+    mapped     like segmented, with balances and versions in a memory-mapped
+               table of fixed-width records (see balance_table.py)
+    sharded    accounts spread over N JSON files by account number hash
+    sqlite     stdlib sqlite3 database in WAL mode with indexed tables
+
+Choose one with the BANK_BACKEND environment variable, e.g.
+
+    BANK_BACKEND=sqlite streamlit run streamlit_bank_app.py
+
+Copy existing data into another backend with:
+
+    python storage.py bank_data.json bank_data.db --key accountNo
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+import serializer
+from account_store import AccountStore
+from balance_table import BalanceTable
+from banking import from_minor, to_minor
+from durable import write_durably
+from field_log import FieldLog
+from journal import Journal
+from records import iso_to_micros, time_range
+from segments import SegmentStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: commits are only serialized within one process
+    fcntl = None
+
+
+class ConflictError(Exception):
+    """The account was changed by someone else since it was read."""
+
+
+class CommitLock:
+    """
+    Re-entrant lock held around a commit: a thread lock within the process and
+    an exclusive flock() on ``path`` across processes.
+
+    The lock file also holds a generation number that every commit bumps. A
+    process compares it with the generation it last wrote to know whether its
+    cached copy of the data is stale, even if the data file's mtime and size
+    look unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rlock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def __enter__(self):
+        self.rlock.acquire()
+        self.depth += 1
+        if self.depth == 1:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            # closing the descriptor releases the flock
+            os.close(self.fd)
+            self.fd = None
+        self.rlock.release()
+
+    def generation(self):
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return int(os.read(self.fd, 20) or 0)
+
+    def bump(self):
+        generation = self.generation() + 1
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, b"%020d" % generation)
+        return generation
+
+
+class StorageBackend:
+    def __init__(self, path, key="accountNo"):
+        self.path = Path(path)
+        self.key = key
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, store):
+        raise NotImplementedError
+
+    def get_account(self, account_no):
+        raise NotImplementedError
+
+    def put_account(self, acct, tx=None):
+        self.put_accounts([(acct, [] if tx is None else [tx])])
+
+    def put_accounts(self, batch):
+        raise NotImplementedError
+
+    def append_transaction(self, account_no, tx):
+        raise NotImplementedError
+
+    def delete_account(self, account_no):
+        raise NotImplementedError
+
+    def iter_accounts(self):
+        return iter(self.load())
+
+    def recent_transactions(self, account_no, n):
+        acct = self.load().get(account_no)
+        if acct is None:
+            return []
+        return list(acct.get("transactions", [])[-n:])
+
+    def data_stamp(self):
+        return None
+
+    def transactions_between(self, account_no, start, end=None):
+        acct = self.load().get(account_no)
+        txs = [] if acct is None else acct.get("transactions", [])
+        lo, hi = time_range(txs, start, end)
+        for i in range(lo, hi):
+            yield txs[i]
+
+    def _copy(self, record):
+        if record is None:
+            return None
+        return {k: record[k] for k in record.keys() if k != "transactions"}
+
+    def _check_version(self, stored, acct):
+        if stored is not None and stored.get("version", 0) != acct.get("version", 0):
+            raise ConflictError(f"Account {acct[self.key]} was changed by someone else.")
+
+    def _merge(self, acct, history):
+        """The record to store for ``acct``: its fields, history, next version."""
+        record = {k: acct[k] for k in acct.keys() if k not in ("transactions", "version")}
+        if history is not None:
+            record["transactions"] = history
+        record["version"] = acct.get("version", 0) + 1
+        return record
+
+    def _history(self, stored, acct, txs):
+        history = acct.get("transactions") if stored is None else stored.get("transactions")
+        if history is None:
+            # the CLI schema has no history at all
+            if not txs:
+                return None
+            history = []
+        for tx in txs:
+            history.append(tx)
+        return history
+
+
+class JsonBackend(StorageBackend):
+    """
+    The whole account list in one JSON file; every write rewrites it.
+
+    The parsed file is cached together with its (inode, mtime, size). load()
+    only touches the disk when the file changed since it was last read or
+    written, e.g. by another process. Writes go to a temp file that is
+    fsync'ed and then replaces the data file (see write_durably), and refresh
+    the cache with what was written.
+    """
+
+    def __init__(self, path, key="accountNo", indent=None, compact=False):
+        super().__init__(path, key)
+        self.indent = indent
+        self.compact = compact
+        self.lock = threading.Lock()
+        self.commit_lock = CommitLock(self.path.with_name(self.path.name + ".lock"))
+        self.generation = None
+        self.cached = None
+        self.hits = 0
+        self.misses = 0
+
+    def _stamp(self):
+        stat = self.path.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        if not self.path.exists():
+            store = AccountStore(key=self.key, compact=self.compact)
+            self.save(store)
+            return store
+        stamp = self._stamp()
+        with self.lock:
+            if self.cached is not None and self.cached[0] == stamp:
+                self.hits += 1
+                return self.cached[1]
+            self.misses += 1
+        data = self.path.read_bytes()
+        records = serializer.loads(data) if data.strip() else []
+        store = AccountStore(records, key=self.key, compact=self.compact)
+        with self.lock:
+            self.cached = (stamp, store)
+        self._parsed(store)
+        return store
+
+    def _parsed(self, store):
+        """Called with each freshly parsed (not cached) store."""
+
+    def _encode(self, store):
+        """The list of records written to the file for ``store``."""
+        return store.to_list()
+
+    def _load_for_commit(self):
+        # call with commit_lock held
+        if self.commit_lock.generation() != self.generation:
+            with self.lock:
+                self.cached = None
+        return self.load()
+
+    def _write(self, store):
+        # call with commit_lock held
+        with self.lock:
+            self.cached = None
+        write_durably(self.path, serializer.dumps(self._encode(store), indent=self.indent))
+        stamp = self._stamp()
+        with self.lock:
+            self.cached = (stamp, store)
+        self.generation = self.commit_lock.bump()
+
+    def save(self, store):
+        with self.commit_lock:
+            self._write(store)
+
+    def cache_stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def data_stamp(self):
+        return self._stamp() if self.path.exists() else None
+
+    def get_account(self, account_no):
+        return self._copy(self.load().get(account_no))
+
+    def put_accounts(self, batch):
+        with self.commit_lock:
+            store = self._load_for_commit()
+            for acct, _ in batch:
+                self._check_version(store.get(acct[self.key]), acct)
+            records = []
+            for acct, txs in batch:
+                stored = store.get(acct[self.key])
+                records.append(self._merge(acct, self._history(stored, acct, txs)))
+            for record in records:
+                store.add(record)
+            self._write(store)
+        for acct, _ in batch:
+            acct["version"] = acct.get("version", 0) + 1
+
+    def append_transaction(self, account_no, tx):
+        with self.commit_lock:
+            store = self._load_for_commit()
+            store.get(account_no).setdefault("transactions", []).append(tx)
+            self._write(store)
+
+    def delete_account(self, account_no):
+        with self.commit_lock:
+            store = self._load_for_commit()
+            store.remove(account_no)
+            self._write(store)
+
+
+class JournalBackend(StorageBackend):
+    """
+    JSON snapshot plus an append-only log; a write appends one line, with
+    the account's profile and only its new transactions.
+
+    The accounts are kept in memory and only read at startup, so only one
+    process may use a journal at a time.
+    """
+
+    def __init__(self, path, key="accountNo", compact_every=1000):
+        super().__init__(path, key)
+        self.journal = Journal(path, key=key, compact_every=compact_every)
+        self.lock = threading.RLock()
+        self.store = None
+        self.changes = 0
+
+    def load(self):
+        with self.lock:
+            if self.store is None:
+                self.store = AccountStore(self.journal.load(), key=self.key)
+            return self.store
+
+    def save(self, store):
+        with self.lock:
+            self.store = store
+            self.journal.compact(store.to_list())
+            self.changes += 1
+
+    def data_stamp(self):
+        # nobody else writes the journal while it is open
+        return self.changes
+
+    def get_account(self, account_no):
+        return self._copy(self.load().get(account_no))
+
+    def _logged(self):
+        self.changes += 1
+        if self.journal.needs_compaction():
+            self.journal.compact(self.store.to_list())
+
+    def put_accounts(self, batch):
+        with self.lock:
+            store = self.load()
+            for acct, _ in batch:
+                self._check_version(store.get(acct[self.key]), acct)
+            for acct, txs in batch:
+                stored = store.get(acct[self.key])
+                record = self._merge(acct, self._history(stored, acct, txs))
+                store.add(record)
+                self._log(stored, record, list(txs))
+                acct["version"] = record["version"]
+            self._logged()
+
+    def _log(self, stored, record, txs):
+        history = record.get("transactions")
+        if stored is None or history is None:
+            # new accounts (with their seed history) and history-less records
+            self.journal.put(record)
+        else:
+            self.journal.update(self._copy(record), len(history) - len(txs), txs)
+
+    def append_transaction(self, account_no, tx):
+        with self.lock:
+            acct = self.load().get(account_no)
+            acct.setdefault("transactions", []).append(tx)
+            self._log(acct, acct, [tx])
+            self._logged()
+
+    def delete_account(self, account_no):
+        with self.lock:
+            self.load().remove(account_no)
+            self.journal.delete(account_no)
+            self._logged()
+
+
+class SegmentedBackend(JsonBackend):
+    """
+    Accounts in one JSON file without their history; each account's
+    transactions are in a segment file (see segments.py) read on demand.
+
+    Existing files with embedded transactions are split up on first load.
+    """
+
+    def __init__(self, path, key="accountNo", indent=None, compact=False):
+        super().__init__(path, key, indent, compact)
+        self.segments = SegmentStore(self.path.with_suffix(".segments"))
+
+    def _parsed(self, store):
+        embedded = [acct for acct in store if "transactions" in acct]
+        if embedded:
+            for acct in embedded:
+                self.segments.write(acct[self.key], acct.pop("transactions"))
+            self.save(store)
+
+    def save(self, store):
+        for acct in store:
+            if "transactions" in acct:
+                self.segments.write(acct[self.key], acct.pop("transactions"))
+        super().save(store)
+
+    def _history(self, stored, acct, txs):
+        # called under the commit lock once the version check passed
+        seed = list(acct.get("transactions", [])) if stored is None else []
+        self.segments.extend(acct[self.key], seed + list(txs))
+        return None
+
+    def append_transaction(self, account_no, tx):
+        with self.commit_lock:
+            self.segments.append(account_no, tx)
+
+    def delete_account(self, account_no):
+        super().delete_account(account_no)
+        self.segments.delete(account_no)
+
+    def iter_accounts(self):
+        for acct in self.load():
+            full = dict(acct.items())
+            full["transactions"] = list(self.segments.read(acct[self.key]))
+            yield full
+
+    def recent_transactions(self, account_no, n):
+        return self.segments.tail(account_no, n)
+
+    def transactions_between(self, account_no, start, end=None):
+        return self.segments.between(account_no, start, end)
+
+
+class MappedBackend(SegmentedBackend):
+    """
+    The segmented layout, with each account's balance and version in a
+    memory-mapped table of fixed-width records (see balance_table.py) instead
+    of the JSON file.
+
+    The JSON file only holds the profiles (name, email, PIN hash, ... and the
+    account's slot in the table), so a deposit or withdrawal appends a line
+    to the account's segment and overwrites its 16-byte balance record in
+    place; the file is only rewritten when a profile field changes or an
+    account is added or deleted. Balances are kept in whole minor units and
+    come back as floats rounded to them. Slots of deleted accounts are not
+    reused until the next save().
+
+    The limits' "activity" aggregates (see limits.py) change with every
+    transaction too, so they are kept out of the profiles as well: a line per
+    change in a .activity log next to the table (see field_log.py).
+
+    ``sync`` is the table's msync policy (always, interval or never; default
+    $BANK_MSYNC or always); the segment and activity appends are fsync'ed
+    under "always" only. Existing data files are converted on first load.
+    """
+
+    BALANCE_FIELDS = ("balance", "version", "transactions")
+    SIDE_FIELDS = ("activity",)
+
+    def __init__(self, path, key="accountNo", indent=None, compact=False, sync=None):
+        super().__init__(path, key, indent, compact)
+        sync = sync or os.environ.get("BANK_MSYNC", "always")
+        self.table = BalanceTable(self.path.with_suffix(".balances"), sync)
+        # the history and activity appends follow the table: fsync'ed unless
+        # the policy lets the latest changes go with the machine anyway
+        self.segments.sync = sync == "always"
+        self.activity = FieldLog(self.path.with_suffix(".activity"), sync=sync == "always")
+        # (store, (table changes, activity stamp)) the balances in the store were read at
+        self.overlaid = None
+
+    def _profile(self, record):
+        return {k: record[k] for k in record.keys() if k not in self.BALANCE_FIELDS + self.SIDE_FIELDS}
+
+    def _encode(self, store):
+        return [self._profile(acct) for acct in store]
+
+    def _parsed(self, store):
+        if any("slot" not in acct for acct in store):
+            # written by another backend: move the balances into the table
+            self.save(store)
+        else:
+            super()._parsed(store)
+
+    def _profiles(self):
+        """The profile store, without reading every balance."""
+        return super().load()
+
+    def _load_for_commit(self):
+        # call with commit_lock held
+        if self.commit_lock.generation() != self.generation:
+            with self.lock:
+                self.cached = None
+        return self._profiles()
+
+    def load(self):
+        store = self._profiles()
+        changes = self.table.changes(), self.activity.stamp()
+        with self.lock:
+            if self.overlaid is not None and self.overlaid[0] is store and self.overlaid[1] == changes:
+                return store
+        rows = list(self.table.read_all())
+        activity = self.activity.all()
+        for acct in store:
+            minor, version = rows[acct["slot"]]
+            acct["balance"] = from_minor(minor)
+            acct["version"] = version
+            if acct[self.key] in activity:
+                acct["activity"] = activity[acct[self.key]]
+            else:
+                acct.pop("activity", None)
+        with self.lock:
+            self.overlaid = (store, changes)
+        return store
+
+    def save(self, store):
+        with self.commit_lock:
+            rows = []
+            kept = self.activity.all()
+            activity = {}
+            for slot, acct in enumerate(store):
+                if "activity" in acct:
+                    activity[acct[self.key]] = acct["activity"]
+                elif acct[self.key] in kept:
+                    activity[acct[self.key]] = kept[acct[self.key]]
+                if "balance" not in acct and "slot" in acct:
+                    minor, version = self.table.read(acct["slot"])
+                else:
+                    minor, version = to_minor(acct.get("balance", 0)), acct.get("version", 0)
+                rows.append((minor, version))
+                acct["slot"] = slot
+                acct["balance"] = from_minor(minor)
+                acct["version"] = version
+            self.table.replace(rows)
+            self.activity.replace(activity)
+            super().save(store)
+            for acct in store:
+                if acct[self.key] in activity:
+                    acct["activity"] = activity[acct[self.key]]
+            with self.lock:
+                self.overlaid = (store, (self.table.changes(), self.activity.stamp()))
+
+    def data_stamp(self):
+        return super().data_stamp(), self.table.changes()
+
+    def get_account(self, account_no):
+        acct = self._copy(self._profiles().get(account_no))
+        if acct is None:
+            return None
+        minor, version = self.table.read(acct.pop("slot"))
+        acct["balance"] = from_minor(minor)
+        acct["version"] = version
+        activity = self.activity.get(account_no)
+        if activity is not None:
+            acct["activity"] = activity
+        return acct
+
+    def put_accounts(self, batch):
+        with self.commit_lock:
+            store = self._load_for_commit()
+            for acct, _ in batch:
+                stored = store.get(acct[self.key])
+                if stored is not None and self.table.read(stored["slot"])[1] != acct.get("version", 0):
+                    raise ConflictError(f"Account {acct[self.key]} was changed by someone else.")
+            records = []
+            profiles = []
+            for acct, txs in batch:
+                stored = store.get(acct[self.key])
+                self._history(stored, acct, txs)
+                profile = self._profile(acct)
+                if stored is None:
+                    profile["slot"] = self.table.allocate()
+                else:
+                    profile["slot"] = stored["slot"]
+                minor, version = to_minor(acct.get("balance", 0)), acct.get("version", 0) + 1
+                records.append((profile["slot"], minor, version))
+                if stored is None or profile != self._profile(stored):
+                    # complete, so a concurrent load() never sees it without a balance
+                    profile["balance"] = from_minor(minor)
+                    profile["version"] = version
+                    profiles.append(profile)
+            # the balance records first: a crash before the profiles are
+            # written leaves unused slots, not accounts without one
+            if len(records) == 1:
+                self.table.write(*records[0])
+            else:
+                self.table.write_many(records)
+            self.activity.put_many((acct[self.key], acct["activity"]) for acct, _ in batch if "activity" in acct)
+            if profiles:
+                for profile in profiles:
+                    store.add(profile)
+                self._write(store)
+        for acct, _ in batch:
+            acct["version"] = acct.get("version", 0) + 1
+
+    def delete_account(self, account_no):
+        with self.commit_lock:
+            stored = self._load_for_commit().get(account_no)
+            if stored is not None:
+                self.table.write(stored["slot"], 0, 0)
+            self.activity.put_many([(account_no, None)])
+            super().delete_account(account_no)
+
+    def iter_accounts(self):
+        for acct in super().iter_accounts():
+            acct.pop("slot", None)
+            yield acct
+
+
+class ShardedBackend(StorageBackend):
+    """
+    Accounts split over ``count`` JSON files by a hash of the account number,
+    so a write rewrites one shard instead of every account.
+
+    Each shard is a JsonBackend of its own (cache, commit lock, atomic
+    writes) and is only read when one of its accounts is first used. The
+    shards live in a .shards directory next to the data file, together with
+    shards.json recording how many there are; change the count with
+    reshard.py. An existing data file is split up when the directory is
+    first created, and left as it was.
+    """
+
+    META = "shards.json"
+
+    def __init__(self, path, key="accountNo", indent=None, compact=False, shards=16):
+        super().__init__(path, key)
+        self.indent = indent
+        self.compact = compact
+        self.directory = self.path.with_suffix(".shards")
+        self.lock = threading.Lock()
+        meta = self.directory / self.META
+        if meta.exists():
+            self.count = json.loads(meta.read_text(encoding="utf-8"))["count"]
+        else:
+            self.count = shards
+            self.shards = [None] * self.count
+            existing = JsonBackend(self.path, key) if self.path.exists() else None
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if existing is not None:
+                self.save(existing.load())
+            meta.write_text(json.dumps({"count": self.count}), encoding="utf-8")
+        self.shards = [None] * self.count
+
+    def shard_of(self, account_no):
+        # crc32 rather than hash(): str hashes change from run to run
+        return zlib.crc32(account_no.encode("utf-8")) % self.count
+
+    def shard(self, i):
+        with self.lock:
+            if self.shards[i] is None:
+                self.shards[i] = JsonBackend(self.directory / f"{i:04d}.json", self.key,
+                                             self.indent, self.compact)
+            return self.shards[i]
+
+    def _for(self, account_no):
+        return self.shard(self.shard_of(account_no))
+
+    def load(self):
+        return AccountStore(
+            (acct for i in range(self.count) for acct in self.shard(i).load()),
+            key=self.key, compact=self.compact)
+
+    def save(self, store):
+        parts = [[] for _ in range(self.count)]
+        for acct in store:
+            parts[self.shard_of(acct[self.key])].append(acct)
+        for i, part in enumerate(parts):
+            self.shard(i).save(AccountStore(part, key=self.key, compact=self.compact))
+
+    def cache_stats(self):
+        opened = [shard for shard in self.shards if shard is not None]
+        return {"hits": sum(s.hits for s in opened), "misses": sum(s.misses for s in opened),
+                "shards": self.count, "loaded": len(opened)}
+
+    def data_stamp(self):
+        return tuple(self.shard(i).data_stamp() for i in range(self.count))
+
+    def get_account(self, account_no):
+        return self._for(account_no).get_account(account_no)
+
+    def put_accounts(self, batch):
+        parts = {}
+        for acct, txs in batch:
+            parts.setdefault(self.shard_of(acct[self.key]), []).append((acct, txs))
+        if len(parts) == 1:
+            i, part = next(iter(parts.items()))
+            self.shard(i).put_accounts(part)
+            return
+        # lock every shard involved (in one order, so two batches cannot
+        # deadlock) and check all versions before the first shard is written
+        with contextlib.ExitStack() as stack:
+            for i in sorted(parts):
+                stack.enter_context(self.shard(i).commit_lock)
+            for i, part in parts.items():
+                store = self.shard(i)._load_for_commit()
+                for acct, _ in part:
+                    self._check_version(store.get(acct[self.key]), acct)
+            for i, part in parts.items():
+                self.shard(i).put_accounts(part)
+
+    def append_transaction(self, account_no, tx):
+        self._for(account_no).append_transaction(account_no, tx)
+
+    def delete_account(self, account_no):
+        self._for(account_no).delete_account(account_no)
+
+    def iter_accounts(self):
+        for i in range(self.count):
+            yield from self.shard(i).iter_accounts()
+
+    def recent_transactions(self, account_no, n):
+        return self._for(account_no).recent_transactions(account_no, n)
+
+    def transactions_between(self, account_no, start, end=None):
+        return self._for(account_no).transactions_between(account_no, start, end)
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Accounts and transactions in two indexed tables.
+
+    Only the account number, balance and version get their own columns; the
+    rest of the profile is stored as JSON so the same tables work for both
+    apps' schemas. Version checks are done by the UPDATE itself, inside a
+    write transaction, so no extra file lock is needed. Transactions also
+    store their time as epoch microseconds, indexed for date range queries.
+    load() reads the accounts without their history (iter_accounts() has
+    it), and save() keeps the stored history of accounts that come without.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS accounts (
+            account_no TEXT PRIMARY KEY,
+            balance    REAL NOT NULL,
+            profile    TEXT NOT NULL,
+            version    INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS transactions (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_no TEXT NOT NULL,
+            type       TEXT NOT NULL,
+            amount     REAL NOT NULL,
+            timestamp  TEXT NOT NULL,
+            micros     INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS transactions_account ON transactions (account_no, id);
+    """
+
+    def __init__(self, path, key="accountNo"):
+        super().__init__(path, key)
+        # sqlite connections cannot be shared between threads, and Streamlit
+        # runs each session in its own thread
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.executescript(self.SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(accounts)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE accounts ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+            if "micros" not in columns:
+                conn.execute("ALTER TABLE transactions ADD COLUMN micros INTEGER")
+                conn.executemany("UPDATE transactions SET micros = ? WHERE id = ?", [
+                    (iso_to_micros(timestamp), row_id)
+                    for row_id, timestamp in conn.execute("SELECT id, timestamp FROM transactions").fetchall()])
+            conn.execute("CREATE INDEX IF NOT EXISTS transactions_time ON transactions (account_no, micros)")
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _profile(self, acct):
+        profile = {k: acct[k] for k in acct.keys() if k not in ("transactions", "version")}
+        return serializer.dumps(profile).decode("utf-8")
+
+    def _row_to_account(self, conn, row, history=True):
+        account_no, balance, version, profile = row
+        acct = serializer.loads(profile)
+        acct["balance"] = balance
+        acct["version"] = version
+        if history:
+            acct["transactions"] = [
+                {"type": t, "amount": a, "timestamp": ts}
+                for t, a, ts in conn.execute(
+                    "SELECT type, amount, timestamp FROM transactions WHERE account_no = ? ORDER BY id",
+                    (account_no,))
+            ]
+        return acct
+
+    def _tx_row(self, account_no, tx):
+        return account_no, tx["type"], tx["amount"], tx["timestamp"], iso_to_micros(tx["timestamp"])
+
+    def _insert_tx(self, conn, account_no, tx):
+        conn.execute(
+            "INSERT INTO transactions (account_no, type, amount, timestamp, micros) VALUES (?, ?, ?, ?, ?)",
+            self._tx_row(account_no, tx))
+
+    def load(self):
+        conn = self.connect()
+        rows = conn.execute("SELECT account_no, balance, version, profile FROM accounts ORDER BY rowid")
+        return AccountStore((self._row_to_account(conn, row, history=False) for row in rows.fetchall()),
+                            key=self.key)
+
+    def save(self, store):
+        with self.connect() as conn:
+            whole = all("transactions" in acct for acct in store)
+            if whole:
+                conn.execute("DELETE FROM transactions")
+            conn.execute("DELETE FROM accounts")
+            for acct in store:
+                conn.execute("INSERT INTO accounts (account_no, balance, version, profile) VALUES (?, ?, ?, ?)",
+                             (acct[self.key], acct["balance"], acct.get("version", 0), self._profile(acct)))
+                # accounts from load() have no history: theirs stays as stored
+                if "transactions" in acct:
+                    if not whole:
+                        conn.execute("DELETE FROM transactions WHERE account_no = ?", (acct[self.key],))
+                    for tx in acct["transactions"]:
+                        self._insert_tx(conn, acct[self.key], tx)
+            if not whole:
+                conn.execute("DELETE FROM transactions WHERE account_no NOT IN (SELECT account_no FROM accounts)")
+
+    def get_account(self, account_no):
+        conn = self.connect()
+        row = conn.execute("SELECT account_no, balance, version, profile FROM accounts WHERE account_no = ?",
+                           (account_no,)).fetchone()
+        return None if row is None else self._row_to_account(conn, row, history=False)
+
+    def put_accounts(self, batch):
+        conn = self.connect()
+        with conn:
+            # take the write lock up front instead of upgrading a read lock
+            conn.execute("BEGIN IMMEDIATE")
+            for acct, txs in batch:
+                account_no, version = acct[self.key], acct.get("version", 0)
+                updated = conn.execute(
+                    "UPDATE accounts SET balance = ?, profile = ?, version = version + 1 "
+                    "WHERE account_no = ? AND version = ?",
+                    (acct["balance"], self._profile(acct), account_no, version)).rowcount
+                if not updated:
+                    if conn.execute("SELECT 1 FROM accounts WHERE account_no = ?", (account_no,)).fetchone():
+                        raise ConflictError(f"Account {account_no} was changed by someone else.")
+                    conn.execute(
+                        "INSERT INTO accounts (account_no, balance, version, profile) VALUES (?, ?, ?, ?)",
+                        (account_no, acct["balance"], version + 1, self._profile(acct)))
+                    txs = list(acct.get("transactions", [])) + list(txs)
+                conn.executemany(
+                    "INSERT INTO transactions (account_no, type, amount, timestamp, micros) VALUES (?, ?, ?, ?, ?)",
+                    [self._tx_row(account_no, tx) for tx in txs])
+        for acct, _ in batch:
+            acct["version"] = acct.get("version", 0) + 1
+
+    def append_transaction(self, account_no, tx):
+        with self.connect() as conn:
+            self._insert_tx(conn, account_no, tx)
+
+    def delete_account(self, account_no):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM transactions WHERE account_no = ?", (account_no,))
+            conn.execute("DELETE FROM accounts WHERE account_no = ?", (account_no,))
+
+    def iter_accounts(self):
+        conn = self.connect()
+        rows = conn.execute("SELECT account_no, balance, version, profile FROM accounts ORDER BY rowid")
+        for row in rows.fetchall():
+            yield self._row_to_account(conn, row)
+
+    def recent_transactions(self, account_no, n):
+        rows = self.connect().execute(
+            "SELECT type, amount, timestamp FROM transactions WHERE account_no = ? ORDER BY id DESC LIMIT ?",
+            (account_no, n)).fetchall()
+        return [{"type": t, "amount": a, "timestamp": ts} for t, a, ts in reversed(rows)]
+
+    def data_stamp(self):
+        # every commit changes the write-ahead log or the database file
+        stamps = []
+        for path in (self.path, self.path.with_name(self.path.name + "-wal")):
+            if path.exists():
+                stat = path.stat()
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamps)
+
+    def transactions_between(self, account_no, start, end=None):
+        query = "SELECT type, amount, timestamp FROM transactions WHERE account_no = ? AND micros >= ?"
+        params = [account_no, start]
+        if end is not None:
+            query += " AND micros < ?"
+            params.append(end)
+        # a cursor of its own, read row by row rather than fetched in one go
+        for t, a, ts in self.connect().cursor().execute(query + " ORDER BY micros, id", params):
+            yield {"type": t, "amount": a, "timestamp": ts}
+
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+BACKENDS = {
+    "json": JsonBackend,
+    "journal": JournalBackend,
+    "segmented": SegmentedBackend,
+    "mapped": MappedBackend,
+    "sharded": ShardedBackend,
+    "sqlite": SqliteBackend,
+}
+
+
+def open_backend(path, key="accountNo", kind=None, **options):
+    """
+    Open the backend named by ``kind`` (default: $BANK_BACKEND or "json").
+
+    ``path`` is the JSON data file; the sqlite backend uses the same name with
+    a .db suffix, the segmented backend keeps history in a .segments
+    directory next to it (the mapped backend also its balances in a .balances
+    file) and the sharded backend its shards in a .shards directory.
+    ``options`` are passed to the JSON, segmented, mapped and sharded
+    backends only (indent, compact, shards for a new sharded layout and sync
+    for the mapped backend).
+
+    Backends are shared by the whole process: Streamlit re-runs the app script
+    for every interaction, and each rerun gets the same backend (and cache).
+    """
+    kind = kind or os.environ.get("BANK_BACKEND", "json")
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {kind!r}, choose from {', '.join(BACKENDS)}")
+    path = Path(path).resolve()
+    cache_key = (kind, path, key, tuple(sorted(options.items())))
+    with _opened_lock:
+        if cache_key not in _opened:
+            if kind == "sqlite":
+                _opened[cache_key] = SqliteBackend(path.with_suffix(".db"), key)
+            elif kind == "journal":
+                _opened[cache_key] = JournalBackend(path, key)
+            else:
+                _opened[cache_key] = BACKENDS[kind](path, key, **options)
+        return _opened[cache_key]
+
+
+def backend_for_file(path, key):
+    """Pick the backend from a file name: .db is sqlite, anything else JSON."""
+    path = Path(path)
+    if path.suffix == ".db":
+        return SqliteBackend(path, key)
+    return JsonBackend(path, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy bank accounts between storage backends.")
+    parser.add_argument("source", help="source file (.json or .db)")
+    parser.add_argument("target", help="target file (.json or .db)")
+    parser.add_argument("--key", default="accountNo",
+                        help='account number field ("accountNo." for the CLI data)')
+    args = parser.parse_args()
+
+    store = AccountStore(backend_for_file(args.source, args.key).iter_accounts(), key=args.key)
+    backend_for_file(args.target, args.key).save(store)
+    print(f"copied {len(store)} accounts from {args.source} to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
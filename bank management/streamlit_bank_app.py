@@ -7,181 +7,169 @@ How to run:
 2. streamlit run streamlit_bank_app.py
 
 Features / improvements over original:
-- Uses a JSON file (bank_data.json) in the working directory (no hardcoded D: path)
-- PINs are not stored in plaintext — they are hashed with SHA-256
+- Uses a JSON file (bank_data.json) in the working directory (no hardcoded D: path),
+  written compactly and with orjson when it is installed
+- Storage backend is configurable: JSON file, append-only journal, JSON with
+  per-account history segments (optionally with balances in a memory-mapped
+  table), sharded JSON files, or SQLite (BANK_BACKEND)
+- Optional group commit (BANK_GROUP_COMMIT_MS): concurrent sessions' changes
+  are written together by one background thread, and each session waits
+  until its change is on disk
+- PINs are not stored in plaintext — they are hashed with salted scrypt
+  (older SHA-256 hashes are upgraded on the next login)
+- Log in once from the sidebar and leave the PIN fields blank afterwards
 - Validation for age (>=18), 4-digit PIN, email simple check, deposit/withdraw limits
-- Transaction history stored per-account (timestamped)
+- Daily withdrawal cap and a maximum number of transactions per hour per
+  account (limits.py; rules from BANK_LIMITS_FILE)
+- Amounts are rounded to cents and balances computed in whole cents, so they
+  do not drift
+- Transaction history stored per-account (timestamped), with statements for
+  any date range (on screen or as CSV), including history moved to
+  compressed monthly archives by archive.py
 - Robust loading/saving with graceful error handling
 - Streamlit UI with separate views: Create, Deposit, Withdraw, Details, Update, Delete
-- Admin view to list accounts (no PINs shown)
+- Admin view to list accounts (no PINs shown), paginated and searchable by
+  account number, name or email prefix
+- Admin analytics: daily totals, balance distribution and the most active
+  accounts, computed with NumPy (analytics.py; needs pip install numpy)
+- Admin metrics: call counts and latency histograms of the operations,
+  loading/saving, JSON and PIN hashing (metrics.py), exportable in the
+  Prometheus text format
+- The account operations live in operations.py and are also served as a
+  JSON-over-HTTP API by bank_server.py
 
 This app is meant for learning/demo purposes only and is NOT suitable for production banking.
 """
 
 import streamlit as st
-import json
+from datetime import datetime, timedelta
 from pathlib import Path
-import random
-import string
-import hashlib
-from datetime import datetime
+import os
+
+import analytics
+import metrics
+import operations
+from account_store import AccountStore, cached_load
+from banking import money
+from statements import Statement, csv_bytes
+from storage import open_backend
+from write_behind import shared
 
 DATA_FILE = Path("bank_data.json")
+# BANK_BACKEND=json (default), journal, segmented, mapped, sharded or sqlite (stored in bank_data.db)
+# BANK_COMPACT_RECORDS=1 keeps the cached JSON accounts as slotted records
+# the file is written compactly (see serializer.py); export_pretty.py makes
+# a readable copy
+BACKEND = open_backend(DATA_FILE, key="accountNo",
+                       compact=os.environ.get("BANK_COMPACT_RECORDS") == "1")
+# BANK_GROUP_COMMIT_MS=5 writes the changes arriving within 5 ms of each
+# other (at most BANK_GROUP_COMMIT_OPS, default 100) in one go, instead of
+# one write per change. Only for a single Streamlit process per data file:
+# the accounts are then kept in memory and not re-read from the file.
+if "BANK_GROUP_COMMIT_MS" in os.environ:
+    BACKEND = shared(BACKEND, window=float(os.environ["BANK_GROUP_COMMIT_MS"]) / 1000,
+                     max_batch=int(os.environ.get("BANK_GROUP_COMMIT_OPS", "100")), durable=True)
+# BANK_METRICS=0 stops recording latencies; BANK_METRICS_FILE keeps them in
+# a Prometheus text file as well (rewritten every 15 s)
+METRICS_FILE = Path(os.environ.get("BANK_METRICS_FILE", "bank_metrics.prom"))
+if "BANK_METRICS_FILE" in os.environ:
+    metrics.export_every(METRICS_FILE)
 
 # -----------------------------
 # Utility functions
 # -----------------------------
 
+@metrics.timed("load_data")
 def load_data():
-    if not DATA_FILE.exists():
-        save_data([])
-        return []
     try:
-        text = DATA_FILE.read_text(encoding="utf-8").strip()
-        if not text:
-            return []
-        return json.loads(text)
+        # reused (with its search index) until the data changes
+        return cached_load(BACKEND)
     except Exception as e:
         st.error(f"Failed to load data file: {e}")
-        return []
+        return AccountStore()
 
 
+@metrics.timed("save_data")
 def save_data(data):
     try:
-        DATA_FILE.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        BACKEND.save(data)
     except Exception as e:
         st.error(f"Failed to save data file: {e}")
 
 
-def hash_pin(pin: str) -> str:
-    return hashlib.sha256(pin.encode("utf-8")).hexdigest()
-
-
-def generate_account_number(length=8) -> str:
-    # AC + 6 random uppercase letters/digits
-    body = ''.join(random.choices(string.ascii_uppercase + string.digits, k=length-2))
-    return f"AC{body}"
+def recent_transactions(account_no, n=10):
+    try:
+        return BACKEND.recent_transactions(account_no, n)
+    except Exception as e:
+        st.error(f"Failed to load transactions: {e}")
+        return []
 
 
-def find_user(data, account_no, pin=None):
-    for acct in data:
-        if acct["accountNo"] == account_no:
-            if pin is None:
-                return acct
-            if acct.get("pin_hash") == hash_pin(str(pin)):
-                return acct
-            return None
-    return None
+def credential(account_no, pin):
+    """The PIN, or the login token when the PIN was left blank (see sidebar)."""
+    session = st.session_state.get("session")
+    if not pin and session and session["accountNo"] == account_no:
+        return session["token"]
+    return pin
 
 
-def add_transaction(acct, ttype, amount):
-    acct.setdefault("transactions", [])
-    acct["transactions"].append({
-        "type": ttype,
-        "amount": amount,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
-    })
+def find_user(account_no, pin=None):
+    try:
+        return operations.find_user(BACKEND, account_no, credential(account_no, pin))
+    except Exception as e:
+        st.error(f"Failed to load data file: {e}")
+        return None
 
 
 # -----------------------------
 # Business logic functions
 # -----------------------------
 
+# the rules live in operations.py, shared with bank_server.py; these only
+# bind them to this app's backend and turn storage errors into messages
+
+def run(operation, *args):
+    try:
+        return operation(BACKEND, *args)
+    except Exception as e:
+        return False, f"Failed to access data file: {e}"
+
+
 def create_account(name, age, email, pin):
-    data = load_data()
-    # basic checks
-    if age < 18:
-        return False, "You must be at least 18 years old to create an account."
-    if not (isinstance(pin, str) and pin.isdigit() and len(pin) == 4):
-        return False, "PIN must be a 4-digit number."
-    # optional: check email contains '@'
-    if "@" not in email or email.strip().startswith("@"): 
-        return False, "Please enter a valid email address."
-
-    account_no = generate_account_number()
-    # ensure unique
-    while any(a["accountNo"] == account_no for a in data):
-        account_no = generate_account_number()
-
-    acct = {
-        "name": name.strip(),
-        "age": int(age),
-        "email": email.strip(),
-        "pin_hash": hash_pin(pin),
-        "accountNo": account_no,
-        "balance": 0,
-        "transactions": []
-    }
-    data.append(acct)
-    save_data(data)
-    return True, acct
+    return run(operations.create_account, name, age, email, pin)
 
 
 def deposit(account_no, pin, amount):
-    data = load_data()
-    acct = find_user(data, account_no, pin)
-    if acct is None:
-        return False, "Account not found or incorrect PIN."
-    if amount <= 0 or amount > 10000:
-        return False, "Deposit amount must be between 1 and 10000."
-    acct["balance"] += amount
-    add_transaction(acct, "deposit", amount)
-    save_data(data)
-    return True, acct
+    return run(operations.deposit, account_no, credential(account_no, pin), amount)
 
 
 def withdraw(account_no, pin, amount):
-    data = load_data()
-    acct = find_user(data, account_no, pin)
-    if acct is None:
-        return False, "Account not found or incorrect PIN."
-    if amount <= 0:
-        return False, "Withdrawal amount must be greater than 0."
-    if acct["balance"] < amount:
-        return False, "Insufficient balance."
-    acct["balance"] -= amount
-    add_transaction(acct, "withdraw", amount)
-    save_data(data)
-    return True, acct
+    return run(operations.withdraw, account_no, credential(account_no, pin), amount)
 
 
 def update_account(account_no, pin, new_name=None, new_email=None, new_pin=None):
-    data = load_data()
-    acct = find_user(data, account_no, pin)
-    if acct is None:
-        return False, "Account not found or incorrect PIN."
-    changed = False
-    if new_name and new_name.strip() != acct["name"]:
-        acct["name"] = new_name.strip()
-        changed = True
-    if new_email and new_email.strip() != acct["email"]:
-        acct["email"] = new_email.strip()
-        changed = True
-    if new_pin:
-        if not (new_pin.isdigit() and len(new_pin) == 4):
-            return False, "New PIN must be a 4-digit number."
-        acct["pin_hash"] = hash_pin(new_pin)
-        changed = True
-    if changed:
-        save_data(data)
-        return True, acct
-    return False, "No changes made."
+    return run(operations.update_account, account_no, credential(account_no, pin), new_name, new_email, new_pin)
+
+
+def login(account_no, pin):
+    return run(operations.login, account_no, pin)
 
 
 def delete_account(account_no, pin):
-    data = load_data()
-    acct = find_user(data, account_no, pin)
-    if acct is None:
-        return False, "Account not found or incorrect PIN."
-    data.remove(acct)
-    save_data(data)
-    return True, None
+    return run(operations.delete_account, account_no, credential(account_no, pin))
 
 
 # -----------------------------
 # Streamlit UI
 # -----------------------------
 
+SEARCH_FIELDS = {"accountNo": "Account number", "name": "Name", "email": "Email"}
+ADMIN_COLUMNS = ["accountNo", "name", "age", "email", "balance", "version", "transactions"]
+DEFAULT_COLUMNS = ["accountNo", "name", "email", "balance"]
+STATEMENT_ROWS = 200
+ANALYTICS_BINS = 20
+METRIC_COLUMNS = ["name", "calls", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "total_s"]
+
 st.set_page_config(page_title="Simple Bank App", layout="centered")
 st.title("🏦Bank Management System)")
 
@@ -190,11 +178,36 @@ menu = st.sidebar.selectbox("Choose action", [
     "Deposit",
     "Withdraw",
     "Show Details",
+    "Statement",
     "Update Details",
     "Delete Account",
-    "Admin: List Accounts"
+    "Admin: List Accounts",
+    "Admin: Analytics",
+    "Admin: Metrics"
 ])
 
+# logging in checks the PIN once; the forms below then accept a blank PIN
+# for that account
+session = st.session_state.get("session")
+if session and st.sidebar.button("Log out"):
+    operations.logout(session["token"])
+    del st.session_state["session"]
+    session = None
+if session:
+    st.sidebar.caption(f"Logged in to {session['accountNo']}")
+else:
+    with st.sidebar.form("login_form"):
+        login_no = st.text_input("Account number")
+        login_pin = st.text_input("PIN", type="password")
+        logged_in = st.form_submit_button("Log in")
+    if logged_in:
+        ok, result = login(login_no.strip(), login_pin)
+        if ok:
+            st.session_state["session"] = {"accountNo": login_no.strip(), "token": result}
+            st.sidebar.success("Logged in.")
+        else:
+            st.sidebar.error(result)
+
 if menu == "Create Account":
     st.header("Create a new account")
     with st.form("create_form"):
@@ -222,13 +235,13 @@ elif menu == "Deposit":
     st.header("Deposit money")
     with st.form("deposit_form"):
         account_no = st.text_input("Account number")
-        pin = st.text_input("PIN", type="password")
-        amount = st.number_input("Amount", min_value=1, value=100)
+        pin = st.text_input("PIN (blank if logged in)", type="password")
+        amount = st.number_input("Amount", min_value=0.01, value=100.0, step=0.01, format="%.2f")
         submitted = st.form_submit_button("Deposit")
     if submitted:
-        ok, result = deposit(account_no.strip(), pin, float(amount))
+        ok, result = deposit(account_no.strip(), pin, money(amount))
         if ok:
-            st.success(f"Deposit successful. New balance: {result['balance']}")
+            st.success(f"Deposit successful. New balance: {result['balance']:.2f}")
         else:
             st.error(result)
 
@@ -236,40 +249,74 @@ elif menu == "Withdraw":
     st.header("Withdraw money")
     with st.form("withdraw_form"):
         account_no = st.text_input("Account number")
-        pin = st.text_input("PIN", type="password")
-        amount = st.number_input("Amount", min_value=1, value=100)
+        pin = st.text_input("PIN (blank if logged in)", type="password")
+        amount = st.number_input("Amount", min_value=0.01, value=100.0, step=0.01, format="%.2f")
         submitted = st.form_submit_button("Withdraw")
     if submitted:
-        ok, result = withdraw(account_no.strip(), pin, float(amount))
+        ok, result = withdraw(account_no.strip(), pin, money(amount))
         if ok:
-            st.success(f"Withdrawal successful. New balance: {result['balance']}")
+            st.success(f"Withdrawal successful. New balance: {result['balance']:.2f}")
         else:
             st.error(result)
 
 elif menu == "Show Details":
     st.header("Account details")
     account_no = st.text_input("Account number")
-    pin = st.text_input("PIN", type="password")
+    pin = st.text_input("PIN (blank if logged in)", type="password")
     if st.button("Show"):
-        acct = find_user(load_data(), account_no.strip(), pin)
+        acct = find_user(account_no.strip(), pin)
         if acct is None:
             st.error("Account not found or incorrect PIN.")
         else:
             st.subheader("Profile")
-            st.write({k: v for k, v in acct.items() if k not in ("pin_hash", "transactions")})
+            st.write({k: v for k, v in acct.items() if k not in ("pin_hash", "transactions", "version", "activity")})
             st.subheader("Transactions")
-            txs = acct.get("transactions", [])
+            txs = recent_transactions(acct["accountNo"], 10)
             if not txs:
                 st.info("No transactions yet.")
             else:
-                for t in reversed(txs[-10:]):
+                for t in reversed(txs):
                     st.write(f"{t['timestamp']} — {t['type'].title()} — {t['amount']}")
 
+elif menu == "Statement":
+    st.header("Account statement")
+    account_no = st.text_input("Account number")
+    pin = st.text_input("PIN (blank if logged in)", type="password")
+    today = datetime.utcnow().date()
+    first_day = st.date_input("From", today - timedelta(days=30))
+    last_day = st.date_input("To", today)
+    if st.button("Show statement"):
+        acct = find_user(account_no.strip(), pin)
+        if acct is None:
+            st.error("Account not found or incorrect PIN.")
+        elif first_day > last_day:
+            st.error("The start date must not be after the end date.")
+        else:
+            try:
+                statement = Statement(BACKEND, acct["accountNo"], first_day, last_day)
+                st.write(f"Opening balance: {statement.opening}")
+                # rows are streamed from the backend; only the first
+                # STATEMENT_ROWS are shown, the CSV has all of them
+                shown = 0
+                for row in statement.rows():
+                    if shown == STATEMENT_ROWS:
+                        st.info(f"Only the first {STATEMENT_ROWS} transactions are shown, download the CSV for all.")
+                        break
+                    st.write(f"{row['timestamp']} — {row['type'].title()} — {row['amount']} — balance {row['balance']}")
+                    shown += 1
+                if shown == 0:
+                    st.info("No transactions in this period.")
+                st.write(f"Closing balance: {statement.closing}")
+                st.download_button("Download CSV", csv_bytes(statement),
+                                   file_name=f"statement_{acct['accountNo']}.csv", mime="text/csv")
+            except Exception as e:
+                st.error(f"Failed to load transactions: {e}")
+
 elif menu == "Update Details":
     st.header("Update account details")
     with st.form("update_form"):
         account_no = st.text_input("Account number")
-        pin = st.text_input("Current PIN", type="password")
+        pin = st.text_input("Current PIN (blank if logged in)", type="password")
         new_name = st.text_input("New name (leave blank to keep)")
         new_email = st.text_input("New email (leave blank to keep)")
         new_pin = st.text_input("New PIN (4 digits) (leave blank to keep)", type="password")
@@ -285,7 +332,7 @@ elif menu == "Delete Account":
     st.header("Delete an account")
     with st.form("delete_form"):
         account_no = st.text_input("Account number")
-        pin = st.text_input("PIN", type="password")
+        pin = st.text_input("PIN (blank if logged in)", type="password")
         confirm = st.checkbox("I confirm I want to permanently delete this account")
         submitted = st.form_submit_button("Delete")
     if submitted:
@@ -302,10 +349,99 @@ elif menu == "Admin: List Accounts":
     st.header("All accounts (admin view)")
     data = load_data()
     st.write(f"Total accounts: {len(data)}")
+    if hasattr(BACKEND, "cache_stats"):
+        stats = BACKEND.cache_stats()
+        st.caption(f"Data cache: {stats['hits']} hits, {stats['misses']} misses")
     if data:
-        # show a safe view without pin_hash
-        safe = [ {k:v for k,v in acct.items() if k != 'pin_hash'} for acct in data ]
-        st.json(safe)
+        # only the current page is read and rendered; searching and counting
+        # go through the sorted indexes (account_index.py)
+        index = data.search_index()
+        search_by = st.selectbox("Search by", list(SEARCH_FIELDS), format_func=SEARCH_FIELDS.get)
+        prefix = st.text_input("Starts with").strip()
+        columns = st.multiselect("Columns", ADMIN_COLUMNS, default=DEFAULT_COLUMNS)
+        page_size = st.selectbox("Rows per page", [10, 25, 50, 100], index=1)
+        matches = index.count(search_by, prefix)
+        pages = max(1, -(-matches // page_size))
+        # a fixed label and key keep the page across reruns; a search with
+        # fewer pages moves it back to the last one
+        if st.session_state.get("admin_page", 1) > pages:
+            st.session_state["admin_page"] = pages
+        page = st.number_input("Page", min_value=1, max_value=pages, key="admin_page")
+        st.caption(f"{matches} matching accounts, page {page} of {pages}")
+        rows = []
+        for account_no in index.page(search_by, prefix, (page - 1) * page_size, page_size):
+            acct = data.get(account_no)
+            # never shown: pin_hash
+            row = {c: acct.get(c) for c in columns if c != "transactions"}
+            if "transactions" in columns:
+                row["transactions"] = recent_transactions(account_no, 5)
+            rows.append(row)
+        if "transactions" in columns:
+            st.json(rows)
+        else:
+            st.dataframe(rows)
+
+elif menu == "Admin: Analytics":
+    st.header("Bank analytics (admin view)")
+    try:
+        # loaded once and reused until the data changes
+        snap = analytics.snapshot(BACKEND)
+    except RuntimeError as e:
+        st.error(str(e))
+        snap = None
+    except Exception as e:
+        st.error(f"Failed to access data file: {e}")
+        snap = None
+    if snap is not None:
+        summary = snap.summary()
+        cols = st.columns(3)
+        cols[0].metric("Accounts", f"{summary['accounts']:,}")
+        cols[1].metric("Transactions", f"{summary['transactions']:,}")
+        cols[2].metric("Total balance", f"{summary['total balance']:,.2f}")
+        if summary["transactions"]:
+            st.subheader("Totals per day")
+            daily = snap.daily_totals()
+            st.bar_chart({"deposits": daily["deposits"], "withdrawals": daily["withdrawals"]})
+            st.dataframe({"date": [str(d) for d in daily["date"]], "deposits": daily["deposits"],
+                          "withdrawals": daily["withdrawals"], "net": daily["net"],
+                          "count": daily["count"]})
+        if summary["accounts"]:
+            st.subheader("Balance distribution")
+            dist = snap.balance_distribution(ANALYTICS_BINS)
+            edges = dist["edges"]
+            st.bar_chart({"accounts": dist["counts"]})
+            st.caption(f"{ANALYTICS_BINS} bands from {edges[0]:,.2f} to {edges[-1]:,.2f}; " +
+                       ", ".join(f"p{p}: {v:,.2f}" for p, v in dist["percentiles"].items()))
+            st.subheader("Most active accounts")
+            top = st.selectbox("Show", [10, 25, 50, 100])
+            st.dataframe(snap.most_active(top))
+
+elif menu == "Admin: Metrics":
+    st.header("Operation latencies (admin view)")
+    if not metrics.enabled():
+        st.info("Recording is switched off (BANK_METRICS=0).")
+    rows = metrics.snapshot()
+    if not rows:
+        st.write("No calls recorded yet.")
+    else:
+        # percentiles are estimated from the histogram buckets
+        st.dataframe([{c: row[c] for c in METRIC_COLUMNS} for row in rows])
+        name = st.selectbox("Histogram of", [row["name"] for row in rows])
+        row = next(r for r in rows if r["name"] == name)
+        labels = [f"{i:02d} <= {bound * 1000:g} ms" for i, bound in enumerate(metrics.BUCKETS)]
+        labels.append(f"{len(labels):02d} > {metrics.BUCKETS[-1] * 1000:g} ms")
+        st.bar_chart({"calls": dict(zip(labels, row["buckets"]))})
+    cols = st.columns(2)
+    if cols[0].button("Reset metrics"):
+        metrics.reset()
+        st.success("Metrics reset.")
+    if cols[1].button("Export Prometheus file"):
+        try:
+            st.success(f"Written to {metrics.write_prometheus(METRICS_FILE)}")
+        except OSError as e:
+            st.error(f"Failed to write {METRICS_FILE}: {e}")
+    with st.expander("Prometheus text"):
+        st.code(metrics.prometheus_text(), language="text")
 
 
 # footer
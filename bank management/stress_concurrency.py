@@ -0,0 +1,80 @@
+"""
+Multi-process stress test for concurrent commits.
+
+Starts several processes that each make many deposits of 1 to randomly chosen
+accounts of the same data file, retrying on ConflictError exactly like the
+Streamlit app does. Afterwards every deposit must be accounted for: the
+balances add up to the number of deposits, and every account's history has
+one transaction per deposit it received. Exits non-zero if an update was
+lost.
+
+How to run:
+    python stress_concurrency.py
+    python stress_concurrency.py --backend sqlite --workers 8 --deposits 500
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from account_store import AccountStore
+from banking import add_transaction
+from storage import ConflictError, open_backend
+
+
+def worker(path, kind, account_nos, deposits, seed):
+    backend = open_backend(path, kind=kind)
+    rng = random.Random(seed)
+    conflicts = 0
+    for _ in range(deposits):
+        account_no = rng.choice(account_nos)
+        while True:
+            acct = backend.get_account(account_no)
+            acct["balance"] += 1
+            tx = add_transaction(acct, "deposit", 1)
+            try:
+                backend.put_account(acct, tx)
+                break
+            except ConflictError:
+                conflicts += 1
+    return conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", default="json", choices=["json", "segmented", "mapped", "sharded", "sqlite"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--deposits", type=int, default=200, help="deposits per worker")
+    parser.add_argument("--accounts", type=int, default=5)
+    args = parser.parse_args()
+
+    path = Path(tempfile.mkdtemp()) / "bank_data.json"
+    account_nos = [f"AC{i:06d}" for i in range(args.accounts)]
+    open_backend(path, kind=args.backend).save(AccountStore(
+        {"accountNo": no, "balance": 0, "transactions": []} for no in account_nos))
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        conflicts = pool.starmap(worker, [
+            (path, args.backend, account_nos, args.deposits, seed) for seed in range(args.workers)
+        ])
+    elapsed = time.perf_counter() - start
+
+    expected = args.workers * args.deposits
+    accounts = list(open_backend(path, kind=args.backend).iter_accounts())
+    total = sum(acct["balance"] for acct in accounts)
+    history_ok = all(len(acct["transactions"]) == acct["balance"] for acct in accounts)
+    print(f"{args.backend}: {expected} deposits by {args.workers} processes in {elapsed:.2f}s, "
+          f"{sum(conflicts)} conflicts retried")
+    print(f"balance total {total} (expected {expected}), history matches balances: {history_ok}")
+    if total != expected or not history_ok:
+        print("LOST UPDATES")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
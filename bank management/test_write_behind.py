@@ -0,0 +1,78 @@
+"""
+Tests for write_behind.py.
+
+How to run:
+    python -m pytest -q test_write_behind.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import operations
+from storage import open_backend
+from write_behind import WriteBehindBackend
+
+
+def test_flushed_history_has_each_deposit_once(tmp_path):
+    inner = open_backend(tmp_path / "bank_data.json", key="accountNo", kind="json")
+    ok, acct = operations.create_account(inner, "Ann", 30, "ann@example.com", "1234")
+    assert ok
+    backend = WriteBehindBackend(inner)
+    for amount in (5, 10, 20):
+        assert operations.deposit(backend, acct["accountNo"], "1234", amount)[0]
+    backend.flush()
+
+    # a fresh backend reads what is on disk
+    stored = open_backend(tmp_path / "bank_data.json", key="accountNo", kind="json")
+    history = list(stored.transactions_between(acct["accountNo"], 0))
+    assert [tx["amount"] for tx in history] == [5, 10, 20]
+    assert stored.get_account(acct["accountNo"])["balance"] == 35
+
+
+def test_failed_batch_leaves_nothing_on_disk(tmp_path):
+    inner = open_backend(tmp_path / "bank_data.json", key="accountNo", kind="json")
+    ok, acct = operations.create_account(inner, "Ann", 30, "ann@example.com", "1234")
+    assert ok
+    ok, other = operations.create_account(inner, "Bob", 30, "bob@example.com", "1234")
+    assert ok
+    account_no = acct["accountNo"]
+    deleting = threading.Event()
+    delete_account = inner.delete_account
+    put_accounts = inner.put_accounts
+    puts = []
+
+    def slow_delete(number):
+        # the second deposit is applied in memory while the first batch
+        # is being written
+        deleting.set()
+        deadline = time.monotonic() + 10
+        while not backend.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        delete_account(number)
+
+    def failing_after_first(batch):
+        puts.append(batch)
+        if len(puts) > 1:
+            raise OSError("disk full")
+        put_accounts(batch)
+
+    inner.delete_account = slow_delete
+    inner.put_accounts = failing_after_first
+    # the delete and the first deposit make up the first batch
+    backend = WriteBehindBackend(inner, max_batch=2, window=0.5, durable=True)
+    first = [threading.Thread(target=backend.delete_account, args=(other["accountNo"],)),
+             threading.Thread(target=operations.deposit, args=(backend, account_no, "1234", 10))]
+    for thread in first:
+        thread.start()
+    assert deleting.wait(10)
+    with pytest.raises(OSError):
+        operations.deposit(backend, account_no, "1234", 20)
+    for thread in first:
+        thread.join()
+
+    stored = open_backend(tmp_path / "bank_data.json", key="accountNo", kind="json")
+    assert stored.get_account(account_no)["balance"] == 10
+    assert [tx["amount"] for tx in stored.transactions_between(account_no, 0)] == [10]
+    assert backend.get_account(account_no)["balance"] == 10
@@ -0,0 +1,271 @@
+"""
+In-memory accounts with persistence in a background thread.
+
+WriteBehindBackend answers every read and commit from an in-memory copy of
+another backend's accounts, and hands the changes to a writer thread that
+persists them through that backend. A commit costs a dict update and a queue
+put; the writer coalesces everything queued while it was busy into one
+put_accounts() call, so a burst of deposits becomes one file write.
+
+Group commit: with a ``window`` (seconds) the writer also waits up to that
+long after the first change of a batch for more to arrive, or until it has
+``max_batch`` of them, before writing. Every commit gets a Future that is
+resolved once its batch is written (or fails); with ``durable=True`` the
+commit methods wait for it, so a caller is only acknowledged once its change
+is on disk, and N concurrent deposits still cost one write. The window trades
+a little latency per commit for fewer writes under load.
+
+Each commit is queued with a copy of the account as it committed it (without
+the history), and the writer persists the latest such copy of each account in
+its batch, never the live in-memory record: that may already hold commits
+queued for a later batch, which could still fail.
+
+Without ``durable``, changes that were acknowledged but not written yet are
+lost if the process dies; flush() waits until everything queued is on disk.
+If a write fails, the batch and every commit still queued behind it fail
+(durable callers get the error) and the accounts they touched are read back
+from the other backend, so memory never holds a change that is not on disk
+underneath a later one that is. Like the journal backend, the in-memory copy
+is only read at startup, so only one process may use the data while it is
+open.
+"""
+
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import metrics
+from account_store import AccountStore
+from storage import StorageBackend
+
+
+class WriteBehindBackend(StorageBackend):
+    def __init__(self, inner, max_batch=10000, window=0.0, durable=False):
+        super().__init__(inner.path, inner.key)
+        self.inner = inner
+        self.max_batch = max_batch
+        self.window = window
+        self.durable = durable
+        self.lock = threading.RLock()
+        self.store = self._own(inner.iter_accounts())
+        # version of each account in ``inner``; it moves on once per write,
+        # not once per coalesced commit
+        self.stored_versions = {acct[self.key]: acct.get("version", 0) for acct in self.store}
+        self.queue = queue.Queue()
+        self.writes = 0
+        self.changes = 0
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def _own(self, records):
+        # copies, history included: json, journal and sharded hand out their
+        # cached records, and put_accounts() appends to the stored history
+        copies = []
+        for acct in records:
+            record = dict(acct.items())
+            if "transactions" in record:
+                record["transactions"] = list(record["transactions"])
+            copies.append(record)
+        return AccountStore(copies, key=self.key)
+
+    def load(self):
+        return self.store
+
+    def save(self, store):
+        self.flush()
+        with self.lock:
+            self.inner.save(store)
+            self.store = self._own(store)
+            self.stored_versions = {acct[self.key]: acct.get("version", 0) for acct in store}
+            self.changes += 1
+
+    def data_stamp(self):
+        return self.changes
+
+    def get_account(self, account_no):
+        with self.lock:
+            return self._copy(self.store.get(account_no))
+
+    def recent_transactions(self, account_no, n):
+        with self.lock:
+            return super().recent_transactions(account_no, n)
+
+    def put_accounts(self, batch):
+        with self.lock:
+            for acct, _ in batch:
+                self._check_version(self.store.get(acct[self.key]), acct)
+            changes = []
+            for acct, txs in batch:
+                stored = self.store.get(acct[self.key])
+                record = self._merge(acct, self._history(stored, acct, txs))
+                self.store.add(record)
+                # a new account's seed history is written like new transactions
+                seed = list(acct.get("transactions", [])) if stored is None else []
+                changes.append(("put", acct[self.key], seed + list(txs), self._snapshot(record)))
+                acct["version"] = record["version"]
+            future = self._submit(changes)
+        return self._acknowledge(future)
+
+    def append_transaction(self, account_no, tx):
+        with self.lock:
+            record = self.store.get(account_no)
+            record.setdefault("transactions", []).append(tx)
+            future = self._submit([("put", account_no, [tx], self._snapshot(record))])
+        return self._acknowledge(future)
+
+    def delete_account(self, account_no):
+        with self.lock:
+            self.store.remove(account_no)
+            future = self._submit([("delete", account_no, None, None)])
+        return self._acknowledge(future)
+
+    def _snapshot(self, record):
+        # the account as committed, for the writer: an empty history only
+        # tells a new account's backend that it has one
+        snapshot = self._copy(record)
+        if "transactions" in record:
+            snapshot["transactions"] = []
+        return snapshot
+
+    def _submit(self, changes):
+        # call with self.lock held, so commits are queued in the order they
+        # were applied in memory
+        future = Future()
+        self.queue.put((changes, future))
+        self.changes += 1
+        return future
+
+    def _acknowledge(self, future):
+        # wait outside self.lock: the writer needs it
+        if self.durable:
+            future.result()
+        return future
+
+    def flush(self):
+        """Wait until every change queued so far has been written."""
+        self.queue.join()
+
+    def pending(self):
+        """Commits queued and not written yet."""
+        return self.queue.qsize()
+
+    def _collect(self):
+        """The next batch of (changes, future) commits, grouped by the window."""
+        commits = [self.queue.get()]
+        size = len(commits[0][0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                commit = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            commits.append(commit)
+            size += len(commit[0])
+        return commits
+
+    def _run(self):
+        while True:
+            commits = self._collect()
+            try:
+                with metrics.timer("group_commit"):
+                    self._write([change for changes, _ in commits for change in changes])
+            except Exception as e:
+                print("write-behind: failed to persist changes", file=sys.stderr)
+                traceback.print_exc()
+                commits = self._rollback(commits)
+                for _, future in commits:
+                    future.set_exception(e)
+            else:
+                for _, future in commits:
+                    future.set_result(None)
+            finally:
+                for _ in commits:
+                    self.queue.task_done()
+
+    def _rollback(self, commits):
+        """
+        Undo the failed ``commits`` in memory, together with every commit
+        queued after them (later changes may build on the failed ones).
+        Returns all of them.
+        """
+        with self.lock:
+            # commits are applied and queued under self.lock, so nothing new
+            # can slip in between draining the queue and reloading
+            while True:
+                try:
+                    commits.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            touched = {change[1] for changes, _ in commits for change in changes}
+            for account_no in touched:
+                record = self.store.get(account_no)
+                stored = self.inner.get_account(account_no)
+                if stored is None:
+                    self.store.remove(account_no)
+                    self.stored_versions.pop(account_no, None)
+                    continue
+                if record is None or "transactions" in record:
+                    stored["transactions"] = list(self.inner.transactions_between(account_no, 0))
+                self.store.add(stored)
+                self.stored_versions[account_no] = stored.get("version", 0)
+            self.changes += 1
+        return commits
+
+    def _write(self, changes):
+        # account number -> (latest snapshot, new transactions), or None if it
+        # ends up deleted; dict order keeps the order the accounts were first
+        # touched in
+        pending = {}
+        deleted = set()
+        for op, account_no, txs, snapshot in changes:
+            if op == "delete":
+                pending[account_no] = None
+                deleted.add(account_no)
+            elif pending.get(account_no) is None:
+                pending[account_no] = (snapshot, list(txs))
+            else:
+                written = pending[account_no][1]
+                written.extend(txs)
+                pending[account_no] = (snapshot, written)
+
+        for account_no in deleted:
+            if account_no in self.stored_versions:
+                self.inner.delete_account(account_no)
+                del self.stored_versions[account_no]
+
+        batch = []
+        for account_no, change in pending.items():
+            if change is None:
+                continue
+            snapshot, txs = change
+            acct = dict(snapshot)
+            if account_no in self.stored_versions:
+                # a new account's whole history is in ``txs``; others keep theirs
+                acct.pop("transactions", None)
+            acct["version"] = self.stored_versions.get(account_no, 0)
+            batch.append((acct, txs))
+        if batch:
+            self.inner.put_accounts(batch)
+            for acct, _ in batch:
+                self.stored_versions[acct[self.key]] = acct["version"]
+            self.writes += 1
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared(inner, **options):
+    """
+    The process's WriteBehindBackend over ``inner`` (made on first use with
+    ``options``), for apps like Streamlit that re-run their script for every
+    interaction and must keep one writer thread.
+    """
+    with _shared_lock:
+        if id(inner) not in _shared:
+            _shared[id(inner)] = WriteBehindBackend(inner, **options)
+        return _shared[id(inner)]